@@ -3,8 +3,25 @@ import logging
 
 # --- General Settings ---
 OUTPUT_DIRECTORY = "console_errors"  # Folder to save the error log files
-CRAWL_DELAY = 1  # Delay in seconds between crawling each page
+CRAWL_DELAY = 1  # Delay in seconds after loading each page before reading its logs (used when PAGE_SETTLE_STRATEGY is 'fixed')
 CREATE_EMPTY_LOG_FILES = False  # If True, create a log file even for pages with no errors found. If False, skip creating files for pages with no errors.
+RESULT_STORE = 'jsonl'  # Where results are saved: 'jsonl' (one JSON line per URL), 'sqlite' (indexed, queryable database) or 'files' (one text file per URL)
+RESULT_STORE_FILE = None  # Path of the 'jsonl'/'sqlite' store. None = results.jsonl / results.sqlite3 inside OUTPUT_DIRECTORY
+RESULT_STORE_BATCH_SIZE = 100  # Results buffered before each write/transaction to the store
+EXPORT_LOG_FILES = False  # If True, also write the per-URL text files when RESULT_STORE is 'jsonl' or 'sqlite' (or export them later with --export-logs)
+RESULT_WRITER_QUEUE_SIZE = 1000  # Results waiting for the background writer thread; when full, workers wait (protects memory if the disk is slow)
+RESULT_WRITER_FLUSH_INTERVAL = 5  # Seconds without new results after which the writer flushes a partial batch to the store
+ERROR_INDEX = True  # Build a deduplicated index of console errors (fingerprint -> occurrences and affected URLs) for the crawl
+ERROR_INDEX_FILE = None  # Where to save the index. None = error_index.json inside OUTPUT_DIRECTORY
+ERROR_INDEX_MAX_URLS = 100  # Maximum affected URLs listed per error in the index (the page count is always complete)
+CRAWL_STATE_FILE = "crawl_state.json"  # File recording when each URL was last crawled successfully (and its sitemap lastmod). Set to None to disable
+INCREMENTAL_CRAWL = False  # If True, only crawl URLs that are new, whose sitemap <lastmod> changed, or that are due for a re-check
+INCREMENTAL_RECHECK_DAYS = 7  # In incremental mode, re-crawl unchanged URLs last crawled more than this many days ago. None = never re-check
+CHECKPOINT_FILE = "crawl_checkpoint.log"  # Journal of completed URLs, used by --resume to continue an interrupted crawl
+CHECKPOINT_FSYNC_EVERY = 50  # Force the checkpoint journal to disk after this many completed URLs
+BROWSER_POOL_SIZE = 1  # Number of Chrome sessions crawling in parallel (each session uses its own browser process and memory)
+CRAWL_EXECUTION_MODE = 'thread'  # 'thread': sessions run in worker threads. 'process': URLs are sharded across worker processes (avoids GIL contention on large pools)
+TABS_PER_BROWSER = 1  # Pages each Chrome session crawls concurrently in separate tabs (needs the optional websockets package when > 1). Far less memory than extra browsers
 
 # --- Script Logging Settings ---
 # Level of detail for the script's own logs (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -14,6 +31,10 @@ SCRIPT_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 # --- Requests Settings (for fetching sitemaps) ---
 REQUESTS_USER_AGENT = 'BoostifyUSA-SitemapCrawler/1.0 (+http://yourwebsite.com/botinfo)' # Modify with your info URL if available
 REQUESTS_TIMEOUT = 30  # Timeout in seconds for fetching sitemaps
+SITEMAP_FETCH_WORKERS = 8  # Max number of child sitemaps fetched concurrently from a sitemap index
+REQUESTS_POOL_SIZE = 10  # Max keep-alive connections kept open per host (should be >= SITEMAP_FETCH_WORKERS)
+REQUESTS_MAX_RETRIES = 3  # Retries for failed connections and 429/5xx responses when fetching sitemaps
+REQUESTS_RETRY_BACKOFF = 0.5  # Backoff factor in seconds between retries (0.5 -> 0.5s, 1s, 2s, ...)
 
 # --- Selenium WebDriver Settings ---
 SELENIUM_HEADLESS = True  # Run Chrome in headless mode (True) or with a visible window (False)
@@ -22,17 +43,84 @@ SELENIUM_NO_SANDBOX = True  # Bypass OS security model (needed on some Linux sys
 SELENIUM_DISABLE_DEV_SHM_USAGE = True  # Overcome limited resource problems in Docker/Linux
 SELENIUM_WINDOW_SIZE = "1920,1080"  # Initial window size (WxH)
 SELENIUM_PAGE_LOAD_TIMEOUT = 60  # Max time in seconds to wait for a page to load
+# When driver.get returns: 'normal' (after all subresources load), 'eager' (at DOMContentLoaded), 'none' (immediately).
+# With 'eager'/'none' the crawler waits for DOMContentLoaded itself, so slow ad/analytics requests don't hold up the crawl.
+SELENIUM_PAGE_LOAD_STRATEGY = 'normal'
 SELENIUM_SCRIPT_TIMEOUT = 30  # Max time in seconds to wait for async scripts
 SELENIUM_DRIVER_LOG_LEVEL = '3' # Verbosity level for the ChromeDriver process itself (e.g., '0' for all, '3' for fatal)
 SELENIUM_USER_AGENT = 'BoostifyUSA-SitemapCrawler/1.0 Selenium (+http://yourwebsite.com/botinfo)' # Modify with your info URL
+CHROMEDRIVER_PATH = None  # Explicit path to a chromedriver executable. If set, webdriver-manager is not used at all
+CHROMEDRIVER_CACHE_FILE = ".chromedriver_cache.json"  # Remembers the resolved chromedriver path between runs. None disables caching
+CHROMEDRIVER_CACHE_MAX_AGE_HOURS = 24  # Re-check for driver updates (via webdriver-manager) after this many hours
+CHROMEDRIVER_OFFLINE = False  # If True, never contact the network for the driver; use CHROMEDRIVER_PATH or the cached path
+
+# --- Crawl Engine ---
+# 'selenium': one ChromeDriver/WebDriver session per worker (BROWSER_POOL_SIZE, CRAWL_EXECUTION_MODE)
+# 'cdp_async': one Chrome started directly and driven over the DevTools websocket from an asyncio event loop,
+#              with ASYNC_CONCURRENT_TABS tabs crawling in parallel. No ChromeDriver needed; requires the optional websockets package
+CRAWL_ENGINE = 'selenium'
+ASYNC_CONCURRENT_TABS = 8  # Tabs crawling concurrently with the 'cdp_async' engine
+CHROME_BINARY_PATH = None  # Chrome executable for the 'cdp_async' engine. None = look for google-chrome/chromium on PATH and in the default install locations
+
+# --- Browser Session Recycling ---
+# Long-lived Chrome sessions grow in memory; each pool worker replaces its session when any limit is hit. Use 0/None to disable a limit.
+SESSION_RECYCLE_PAGES = 500  # Restart the browser after this many pages
+SESSION_RECYCLE_MAX_RSS_MB = 2048  # Restart once chromedriver + Chrome processes use this much memory (MB). Requires the optional psutil package
+SESSION_RECYCLE_CONSECUTIVE_ERRORS = 3  # Restart after this many consecutive WebDriver errors
+CRASH_RETRY_ATTEMPTS = 2  # If Chrome/chromedriver dies while loading a page, retry that URL in a fresh browser this many times
+CRASH_RESTART_ATTEMPTS = 3  # How many times to try starting a replacement browser before the worker gives up
+SESSION_WARM_SPARE = True  # Start the replacement browser in the background ahead of a planned restart, so recycling doesn't stall the crawl
+SESSION_WARM_SPARE_LEAD = 20  # How many pages before SESSION_RECYCLE_PAGES the warm spare is started
+
+# --- Host Politeness ---
+# Paces page loads per host across all workers/tabs of a crawl process (with CRAWL_EXECUTION_MODE 'process', HOST_MAX_CONCURRENCY is split between the processes and each backs off on its own)
+HOST_MAX_CONCURRENCY = 4  # Most pages of one host being navigated to at the same time (pages that are only settling don't count), across all browsers/tabs. 0 = unlimited
+HOST_MIN_INTERVAL = 0  # Minimum seconds between starting two page loads on one host
+HOST_MAX_INTERVAL = 30  # Upper bound in seconds for the interval when backing off
+HOST_ADAPTIVE_RATE = True  # Back off on HTTP 429/503, timeouts or rising time to first byte, and ramp back up while the host is healthy
+HOST_BACKOFF_FACTOR = 2.0  # Interval multiplier on each back-off (concurrency is halved)
+HOST_RAMP_UP_FACTOR = 0.9  # Interval multiplier on each healthy response (concurrency grows by one per round of healthy pages)
+HOST_SLOW_TTFB_FACTOR = 3.0  # A page counts as slow when its time to first byte exceeds this multiple of the host's usual TTFB
+HOST_THROTTLE_RETRIES = 2  # Retry a page answered with 429/503 this many times, after backing off
+
+# --- Page Settle Settings ---
+# How to decide a loaded page is done before reading its console logs:
+# 'settle': wait until the page is loaded, no new resources are fetched and no new console entries appear for PAGE_SETTLE_QUIET_MS (capped by PAGE_SETTLE_MAX_WAIT)
+# 'fixed': always sleep CRAWL_DELAY seconds
+PAGE_SETTLE_STRATEGY = 'settle'
+PAGE_SETTLE_QUIET_MS = 500  # Quiet period (milliseconds) without network or console activity that counts as settled
+PAGE_SETTLE_MAX_WAIT = 10  # Hard cap in seconds on waiting for a page to settle
+PAGE_SETTLE_POLL_INTERVAL = 0.1  # Seconds between activity checks while waiting
+
+# --- Resource Blocking ---
+# Requests blocked in every browser session to speed up page loads (only console errors matter).
+# Resource types: 'image', 'font', 'media', 'stylesheet'. Blocking may trigger errors on pages whose scripts depend on these resources.
+BLOCK_RESOURCE_TYPES = []  # Example: ['image', 'font', 'media']
+# Wildcard URL patterns to block (e.g., third-party trackers). Example: ['*google-analytics.com*', '*doubleclick.net*']
+BLOCK_URL_PATTERNS = []
 
 # --- Browser Console Log Settings ---
 # Log level to capture from the browser console. Options: 'SEVERE', 'WARNING', 'INFO', 'ALL'
 # Note: Capturing lower levels (WARNING, INFO) can generate a LOT of data. 'SEVERE' usually captures JavaScript errors.
 BROWSER_LOG_LEVEL = 'SEVERE'
-# Optional: List of substrings. If a log message contains any of these (case-insensitive), it will be excluded.
-# Example: FILTER_LOG_MESSAGES = ['favicon.ico', 'jquery-migrate']
+# Optional: List of filter rules (all case-insensitive). A log message matching any of them will be excluded.
+# Plain strings match anywhere in the message; prefix 're:' for a regular expression, 'glob:' for a shell-style pattern matched against the whole message.
+# Example: FILTER_LOG_MESSAGES = ['favicon.ico', 'jquery-migrate', r're:status of 40[34]\b', 'glob:https://ads.*']
 FILTER_LOG_MESSAGES = []
+# Optional: Scoped suppression rules, applied as each entry is captured (suppressed entries are never stored).
+# Each rule is a dict; an entry is dropped when it matches ALL keys the rule sets (matching is case-insensitive):
+#   'level': level name or list of names, e.g. 'WARNING' or ['INFO', 'WARNING']
+#   'message': regular expression searched in the message
+#   'source': glob for the script/resource URL the message comes from, e.g. '*/wp-content/plugins/slider/*'
+#   'page': glob for the URL of the crawled page, e.g. 'https://example.com/shop/*'
+#   'expires': 'YYYY-MM-DD', last day the rule applies (useful for known issues with a fix scheduled)
+#   'note': free text for your own reference
+# Example: SUPPRESSION_RULES = [{'level': 'WARNING', 'page': '*/shop/*', 'message': r'deprecated', 'expires': '2025-12-31'}]
+SUPPRESSION_RULES = []
+# How console output is captured:
+# 'get_log': read the browser log buffer through WebDriver after the page settles (limited buffer, no stack traces)
+# 'cdp': stream Runtime.consoleAPICalled, Runtime.exceptionThrown and Log.entryAdded events over the Chrome DevTools Protocol as they happen (includes stack traces)
+CONSOLE_CAPTURE_BACKEND = 'get_log'
 
 # --- Sitemap Parsing ---
 # Namespaces used for finding URLs in sitemap XML files
@@ -40,4 +128,6 @@ SITEMAP_NAMESPACES = {
     's': 'http://www.sitemaps.org/schemas/sitemap/0.9',
     # Add other namespaces if your sitemaps use them (e.g., 'image:', 'video:')
 }
-SITEMAP_XML_RECOVER_MODE = True # Attempt to parse slightly malformed XML sitemaps
\ No newline at end of file
+SITEMAP_XML_RECOVER_MODE = True # Attempt to parse slightly malformed XML sitemaps
+SITEMAP_CACHE_DIRECTORY = ".sitemap_cache" # Folder for cached sitemap results, revalidated with ETag/Last-Modified on each run. Set to None to disable caching
+SITEMAP_STREAMING_PARSER = True # Parse sitemaps incrementally while downloading (constant memory). False loads each sitemap fully before parsing
\ No newline at end of file
@@ -30,17 +30,51 @@ SOFTWARE.
 """
 
 import requests
+import websocket
 import time
+import datetime
 import os
+import io
+import gzip
+import zlib
+import json
+import sqlite3
+import hashlib
+import functools
+import fnmatch
 import re
 import logging
+import argparse
+import multiprocessing
+import queue
+import threading
+import asyncio
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.common.exceptions import WebDriverException, TimeoutException, InvalidSessionIdException
+
+# Optional: used to measure browser memory for SESSION_RECYCLE_MAX_RSS_MB
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Optional: only needed for CRAWL_ENGINE = 'cdp_async'
+try:
+    import websockets
+except ImportError:
+    websockets = None
 
 # --- Import Configuration ---
 try:
@@ -57,6 +91,78 @@ except ImportError:
 logging.basicConfig(level=settings.SCRIPT_LOG_LEVEL, format=settings.SCRIPT_LOG_FORMAT)
 # --- End Logging Configuration ---
 
+# First bytes of every gzip stream, used to detect compressed sitemaps (.xml.gz)
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Bump when the layout of sitemap cache entries changes; older entries are then ignored
+SITEMAP_CACHE_VERSION = 2
+
+# Page activity probe used to detect when a page has settled: load state and number of fetched resources.
+# The resource timing buffer holds 250 entries by default; once full, the count would stop growing while
+# requests are still running, so the probe raises it (harmless to repeat on every poll)
+PAGE_ACTIVITY_SCRIPT = (
+    "performance.setResourceTimingBufferSize(100000);"
+    " return [document.readyState, performance.getEntriesByType('resource').length];"
+)
+
+# Total network transfer size of the current page and its resources, in bytes
+PAGE_TRANSFER_SIZE_SCRIPT = (
+    "return performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))"
+    ".reduce(function (total, entry) { return total + (entry.transferSize || 0); }, 0);"
+)
+
+# File extensions blocked for each BLOCK_RESOURCE_TYPES entry
+RESOURCE_TYPE_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'media': ['mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'mov', 'avi'],
+    'stylesheet': ['css'],
+}
+# Console message Chrome logs for every request blocked by Network.setBlockedURLs
+BLOCKED_REQUEST_MARKER = 'net::ERR_BLOCKED_BY_CLIENT'
+
+# Status and time to first byte of the current page's main document (responseStatus needs Chrome 109+)
+PAGE_NAVIGATION_TIMING_SCRIPT = (
+    "var entry = performance.getEntriesByType('navigation')[0];"
+    " return entry ? [entry.responseStatus || null, entry.responseStart - entry.requestStart] : [null, null];"
+)
+
+# HTTP statuses meaning a host wants us to slow down
+HOST_THROTTLE_STATUSES = (429, 503)
+
+# Chrome executables tried by the asyncio engine when CHROME_BINARY_PATH is not set
+CHROME_BINARY_CANDIDATES = (
+    'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+    r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+)
+CHROME_STARTUP_TIMEOUT = 30  # Seconds to wait for Chrome to open its DevTools port
+
+# Script/resource URL a console message starts with (both capture backends put it first)
+SOURCE_URL_PATTERN = re.compile(r'^(?:https?|wss?|blob|file|chrome-extension)://\S+')
+
+# Normalization of console messages before fingerprinting (see normalize_log_message)
+FINGERPRINT_URL_PATTERN = re.compile(r'\b(?:https?|wss?|blob|chrome-extension)://[^\s\'"()<>]+')
+FINGERPRINT_LINE_COL_PATTERN = re.compile(r'(?<![\w.])\d+:\d+(?![\w.])')
+FINGERPRINT_NUMBER_PATTERN = re.compile(r'\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b|(?<!\d)(?<!status of )\d+', re.IGNORECASE) # HTTP status codes are kept
+
+# Error text meaning the browser or chromedriver is gone and the session can't be reused
+DEAD_SESSION_MARKERS = (
+    'invalid session id',
+    'chrome not reachable',
+    'session deleted because of page crash',
+    'tab crashed',
+    'disconnected: not connected to devtools',
+    'connection refused',
+    'failed to establish a new connection',
+    'max retries exceeded',
+    'remote end closed connection',
+)
+
+# Browser log levels from least to most severe, used to filter DevTools console events
+BROWSER_LOG_LEVEL_RANKS = {'ALL': 0, 'DEBUG': 1, 'INFO': 2, 'WARNING': 3, 'SEVERE': 4}
+
 
 def sanitize_filename(url):
     """Creates a safe filename from a URL."""
@@ -96,94 +202,562 @@ def sanitize_filename(url):
     return f"{safe_name}.log"
 
 
-def get_all_page_urls(sitemap_url, visited_sitemaps=None):
+def create_requests_session():
     """
-    Recursively fetches and parses sitemaps (index or regular)
-    and returns a set of all unique page URLs found. Uses settings from settings.py
+    Creates a requests Session for sitemap fetching, with a keep-alive connection
+    pool and automatic retries configured from settings.py. Share one session
+    across all sitemap fetches so requests to the same host reuse connections.
     """
-    if visited_sitemaps is None:
-        visited_sitemaps = set()
+    session = requests.Session()
+    # Use User-Agent from settings
+    session.headers.update({'User-Agent': settings.REQUESTS_USER_AGENT})
 
-    if sitemap_url in visited_sitemaps:
-        logging.warning(f"Sitemap already visited, skipping: {sitemap_url}")
-        return set()
+    retry = Retry(
+        total=settings.REQUESTS_MAX_RETRIES,
+        backoff_factor=settings.REQUESTS_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False, # Let raise_for_status report the final response
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.REQUESTS_POOL_SIZE,
+        pool_maxsize=settings.REQUESTS_POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-    visited_sitemaps.add(sitemap_url)
-    page_urls = set()
-    # Use User-Agent from settings
-    headers = {'User-Agent': settings.REQUESTS_USER_AGENT}
+
+def _sitemap_entry_fields(entry, sitemap_ns):
+    """
+    Returns the (loc, lastmod) texts of a <url> or <sitemap> entry element.
+    Either value is None if missing.
+    """
+    fields = {}
+    for child in entry:
+        if not isinstance(child.tag, str):
+            continue # Skip comments and processing instructions
+        tag = etree.QName(child.tag)
+        if tag.namespace in (None, sitemap_ns) and tag.localname in ('loc', 'lastmod') and child.text:
+            fields[tag.localname] = child.text.strip()
+    return fields.get('loc'), fields.get('lastmod')
+
+
+def _add_sitemap_entry(sitemap_url, root_tag, loc, lastmod, child_sitemaps, page_urls):
+    """
+    Records one entry found in a sitemap: as an absolute child sitemap URL for a
+    sitemap index, or as a page URL (mapped to its <lastmod>) for a URL set.
+    """
+    if not loc:
+        return
+    if root_tag == 'sitemapindex':
+        child_sitemaps.append(urljoin(sitemap_url, loc))
+    elif loc.startswith('http://') or loc.startswith('https://'):
+        page_urls[loc] = lastmod
+    else:
+        logging.warning(f"Skipping invalid/relative URL found in {sitemap_url}: {loc}")
+
+
+def _parse_sitemap_tree(content, sitemap_url, child_sitemaps, page_urls):
+    """
+    Parses a fully downloaded sitemap by building the whole lxml tree.
+    """
+    # Use recover mode from settings
+    parser = etree.XMLParser(recover=settings.SITEMAP_XML_RECOVER_MODE, remove_blank_text=True)
+    root = etree.fromstring(content, parser=parser)
+
+    # Check if root element exists (parsing might recover but result in None)
+    if root is None:
+         logging.error(f"Failed to parse XML structure correctly (root is None) for: {sitemap_url}")
+         return
+
+    # Use namespaces from settings
+    sitemap_ns = settings.SITEMAP_NAMESPACES.get('s', '')
+
+    # Make tag checking more robust against default namespace variations
+    tag_name = etree.QName(root.tag).localname
+
+    # Check if it's a sitemap index file
+    if tag_name == 'sitemapindex':
+        logging.info(f"Detected sitemap index: {sitemap_url}")
+        # Use explicit namespace in XPath for reliability
+        entries = root.xpath('.//s:sitemap', namespaces={'s': sitemap_ns})
+
+    # Check if it's a URL set file
+    elif tag_name == 'urlset':
+        logging.info(f"Detected URL set: {sitemap_url}")
+        # Use explicit namespace in XPath
+        entries = root.xpath('.//s:url', namespaces={'s': sitemap_ns})
+    else:
+        logging.warning(f"Unknown sitemap format/root tag '{root.tag}' in: {sitemap_url}")
+        return
+
+    for entry in entries:
+        loc, lastmod = _sitemap_entry_fields(entry, sitemap_ns)
+        _add_sitemap_entry(sitemap_url, tag_name, loc, lastmod, child_sitemaps, page_urls)
+
+
+class _ContentSniffingStream:
+    """File-like wrapper noting whether anything but whitespace was read, to tell empty bodies from broken XML."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.has_content = False
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if not self.has_content and data.strip():
+            self.has_content = True
+        return data
+
+
+def _parse_sitemap_stream(stream, sitemap_url, child_sitemaps, page_urls):
+    """
+    Parses a sitemap incrementally from a file-like stream with iterparse, so
+    entries are recorded as they are downloaded and each <url>/<sitemap>
+    element is discarded once handled. Memory use stays flat regardless of
+    sitemap size.
+    """
+    sitemap_ns = settings.SITEMAP_NAMESPACES.get('s', '')
+    entry_tags = {'sitemapindex': 'sitemap', 'urlset': 'url'}
+    root_tag = None
+
+    stream = _ContentSniffingStream(stream)
+    context = etree.iterparse(stream, events=('start', 'end'),
+                              recover=settings.SITEMAP_XML_RECOVER_MODE, remove_blank_text=True)
+    try:
+        for event, element in context:
+            tag = etree.QName(element.tag)
+
+            if root_tag is None:
+                # First event is the start of the root element
+                root_tag = tag.localname
+                if root_tag == 'sitemapindex':
+                    logging.info(f"Detected sitemap index: {sitemap_url}")
+                elif root_tag == 'urlset':
+                    logging.info(f"Detected URL set: {sitemap_url}")
+                else:
+                    logging.warning(f"Unknown sitemap format/root tag '{element.tag}' in: {sitemap_url}")
+                    return
+                continue
+
+            if event != 'end' or tag.namespace not in (None, sitemap_ns) or tag.localname != entry_tags[root_tag]:
+                continue
+
+            loc, lastmod = _sitemap_entry_fields(element, sitemap_ns)
+            _add_sitemap_entry(sitemap_url, root_tag, loc, lastmod, child_sitemaps, page_urls)
+
+            # Free the finished entry and any already-processed siblings
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    except etree.XMLSyntaxError:
+        # iterparse rejects a body without any markup; report that as an empty sitemap below
+        if root_tag is not None or stream.has_content:
+            raise
+
+    if root_tag is None:
+        logging.warning(f"Sitemap is empty: {sitemap_url}")
+
+
+def _sitemap_cache_path(sitemap_url):
+    """Returns the cache file path for a sitemap URL (hashed, so any URL is a safe filename)."""
+    digest = hashlib.sha256(sitemap_url.encode('utf-8')).hexdigest()
+    return os.path.join(settings.SITEMAP_CACHE_DIRECTORY, f"{digest}.json")
+
+
+def load_sitemap_cache(sitemap_url):
+    """
+    Returns the cached validators and parsed results for a sitemap URL, or None
+    if caching is disabled or nothing usable is cached.
+    """
+    if not settings.SITEMAP_CACHE_DIRECTORY:
+        return None
+    try:
+        with open(_sitemap_cache_path(sitemap_url), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable sitemap cache entry for {sitemap_url}: {e}")
+        return None
+    if cached.get('version') != SITEMAP_CACHE_VERSION or cached.get('url') != sitemap_url:
+        return None
+    return cached
+
+
+def save_sitemap_cache(sitemap_url, response, child_sitemaps, page_urls):
+    """
+    Stores the response's ETag/Last-Modified validators together with the parsed
+    results, so the next run can revalidate with a conditional GET. Responses
+    without validators are not cached.
+    """
+    if not settings.SITEMAP_CACHE_DIRECTORY:
+        return
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+
+    entry = {
+        'version': SITEMAP_CACHE_VERSION,
+        'url': sitemap_url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'child_sitemaps': child_sitemaps,
+        'page_urls': page_urls,
+    }
+    cache_path = _sitemap_cache_path(sitemap_url)
+    try:
+        os.makedirs(settings.SITEMAP_CACHE_DIRECTORY, exist_ok=True)
+        # Write to a temp file and swap it in so an interrupted run never leaves a truncated entry
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not write sitemap cache entry for {sitemap_url}: {e}")
+
+
+def fetch_sitemap(sitemap_url, session):
+    """
+    Fetches and parses a single sitemap (index or regular) without following
+    child sitemaps, using the given requests session. Returns a tuple
+    (child_sitemap_urls, page_urls): a list of absolute child sitemap URLs for
+    an index, and a dict mapping page URLs to their <lastmod> (or None) for a URL set.
+    With SITEMAP_STREAMING_PARSER enabled the body is parsed while it downloads.
+    Gzipped sitemaps (e.g. sitemap.xml.gz) are decompressed transparently.
+    If SITEMAP_CACHE_DIRECTORY is set, the request is conditional and cached
+    results are reused when the server answers 304 Not Modified.
+    Errors are logged and result in empty results.
+    """
+    child_sitemaps = []
+    page_urls = {}
+
+    # Revalidate against the previous run's validators, if any
+    cached = load_sitemap_cache(sitemap_url)
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
 
     try:
         logging.info(f"Fetching sitemap: {sitemap_url}")
         # Use timeout from settings
-        response = requests.get(sitemap_url, headers=headers, timeout=settings.REQUESTS_TIMEOUT)
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-
-        content = response.content
-        if not content:
-            logging.warning(f"Sitemap is empty: {sitemap_url}")
-            return set()
-
-        # Use recover mode from settings
-        parser = etree.XMLParser(recover=settings.SITEMAP_XML_RECOVER_MODE, remove_blank_text=True)
-        root = etree.fromstring(content, parser=parser)
-
-        # Check if root element exists (parsing might recover but result in None)
-        if root is None:
-             logging.error(f"Failed to parse XML structure correctly (root is None) for: {sitemap_url}")
-             return set()
-
-        # Use namespaces from settings
-        sitemap_ns = settings.SITEMAP_NAMESPACES
-
-        # Make tag checking more robust against default namespace variations
-        tag_name = etree.QName(root.tag).localname
-
-        # Check if it's a sitemap index file
-        if tag_name == 'sitemapindex':
-            logging.info(f"Detected sitemap index: {sitemap_url}")
-            # Use explicit namespace in XPath for reliability
-            sitemaps = root.xpath('.//s:sitemap/s:loc/text() | .//default:sitemap/default:loc/text()',
-                                 namespaces={'s': sitemap_ns.get('s', ''), 'default': sitemap_ns.get('s', '')})
-            for sub_sitemap_url in sitemaps:
-                absolute_sub_url = urljoin(sitemap_url, sub_sitemap_url.strip())
-                page_urls.update(get_all_page_urls(absolute_sub_url, visited_sitemaps))
-
-        # Check if it's a URL set file
-        elif tag_name == 'urlset':
-            logging.info(f"Detected URL set: {sitemap_url}")
-            # Use explicit namespace in XPath
-            urls = root.xpath('.//s:url/s:loc/text() | .//default:url/default:loc/text()',
-                             namespaces={'s': sitemap_ns.get('s', ''), 'default': sitemap_ns.get('s', '')})
-            for page_url in urls:
-                 url_text = page_url.strip()
-                 if url_text.startswith('http://') or url_text.startswith('https://'):
-                     page_urls.add(url_text)
-                 else:
-                     logging.warning(f"Skipping invalid/relative URL found in {sitemap_url}: {url_text}")
-        else:
-            logging.warning(f"Unknown sitemap format/root tag '{root.tag}' in: {sitemap_url}")
+        with session.get(sitemap_url, headers=headers, timeout=settings.REQUESTS_TIMEOUT,
+                         stream=settings.SITEMAP_STREAMING_PARSER) as response:
+            if response.status_code == 304 and cached:
+                logging.info(f"Sitemap not modified, using cached results: {sitemap_url}")
+                return list(cached['child_sitemaps']), dict(cached['page_urls'])
+
+            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+
+            if settings.SITEMAP_STREAMING_PARSER:
+                # Let urllib3 undo any Content-Encoding (gzip/deflate) while streaming
+                response.raw.decode_content = True
+                # Keep the raw stream open at EOF so the buffered wrapper can see the end of data
+                response.raw.auto_close = False
+                stream = io.BufferedReader(response.raw)
+                # .xml.gz files are gzipped payloads, not a transfer encoding; detect them by magic bytes
+                if stream.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+                    logging.info(f"Decompressing gzipped sitemap: {sitemap_url}")
+                    stream = gzip.GzipFile(fileobj=stream)
+                _parse_sitemap_stream(stream, sitemap_url, child_sitemaps, page_urls)
+            else:
+                content = response.content
+                if content.startswith(GZIP_MAGIC):
+                    logging.info(f"Decompressing gzipped sitemap: {sitemap_url}")
+                    content = gzip.decompress(content)
+                if not content:
+                    logging.warning(f"Sitemap is empty: {sitemap_url}")
+                    return child_sitemaps, page_urls
+                _parse_sitemap_tree(content, sitemap_url, child_sitemaps, page_urls)
+
+            # Only reached when the sitemap was parsed without errors
+            save_sitemap_cache(sitemap_url, response, child_sitemaps, page_urls)
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to fetch sitemap {sitemap_url}: {e}")
     except etree.XMLSyntaxError as e:
         logging.error(f"Failed to parse XML sitemap {sitemap_url}: {e}")
+    except (gzip.BadGzipFile, EOFError, zlib.error) as e:
+        logging.error(f"Failed to decompress gzipped sitemap {sitemap_url}: {e}")
     except Exception as e:
         # Catching potential errors during urljoin or set updates etc.
         logging.error(f"An unexpected error occurred while processing {sitemap_url}: {e}", exc_info=True) # Include traceback
 
-    return page_urls
+    return child_sitemaps, page_urls
 
-def crawl_and_log_errors(urls_to_crawl):
+
+def iter_sitemap_entries(sitemap_url, visited_sitemaps=None, session=None):
     """
-    Crawls each URL using Selenium, captures console errors based on settings.py,
-    and saves them to individual files.
+    Fetches and parses sitemaps (index or regular), following child sitemaps
+    concurrently with up to SITEMAP_FETCH_WORKERS threads, and yields a
+    (page_url, lastmod) tuple for each unique page URL as soon as the sitemap
+    containing it has been parsed, while the remaining sitemaps are still being
+    fetched. lastmod is the raw <lastmod> text, or None if the sitemap has none.
+    All fetches share one pooled requests session (created from settings.py if not given).
     """
-    if not urls_to_crawl:
-        logging.info("No URLs found to crawl.")
-        return
+    if visited_sitemaps is None:
+        visited_sitemaps = set()
+
+    owns_session = session is None
+    if owns_session:
+        session = create_requests_session()
+
+    seen_urls = set()
+    max_workers = max(1, int(settings.SITEMAP_FETCH_WORKERS))
+
+    try:
+        # Only this thread touches visited_sitemaps, so cycle protection needs no locking
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='SitemapFetch') as executor:
+            pending = set()
+            to_fetch = [sitemap_url]
+            while to_fetch or pending:
+                for url in to_fetch:
+                    if url in visited_sitemaps:
+                        logging.warning(f"Sitemap already visited, skipping: {url}")
+                        continue
+                    visited_sitemaps.add(url)
+                    pending.add(executor.submit(fetch_sitemap, url, session))
+                to_fetch = []
+
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    child_sitemaps, page_urls = future.result()
+                    to_fetch.extend(child_sitemaps)
+                    # Deduplicate incrementally across sitemaps
+                    for url, lastmod in page_urls.items():
+                        if url not in seen_urls:
+                            seen_urls.add(url)
+                            yield url, lastmod
+    finally:
+        if owns_session:
+            session.close()
+
+
+def iter_page_urls(sitemap_url, visited_sitemaps=None, session=None):
+    """
+    Yields each unique page URL found in the sitemap(s) as soon as it is
+    discovered. See iter_sitemap_entries.
+    """
+    for url, _ in iter_sitemap_entries(sitemap_url, visited_sitemaps, session):
+        yield url
+
+
+def get_all_page_urls(sitemap_url, visited_sitemaps=None, session=None):
+    """
+    Fetches and parses sitemaps (index or regular) and returns a set of all
+    unique page URLs found. See iter_page_urls for the streaming version.
+    Uses settings from settings.py
+    """
+    return set(iter_page_urls(sitemap_url, visited_sitemaps, session))
+
+
+class CrawlState:
+    """
+    Persistent record of when each URL was last crawled successfully and which
+    sitemap <lastmod> it had at the time, stored as JSON in CRAWL_STATE_FILE.
+    Used by select_urls_to_crawl to skip unchanged pages. Thread-safe.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries or {}
+        self._seen_lastmods = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Loads the state from path; a missing or unreadable file gives an empty state."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(path, json.load(f).get('urls', {}))
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read crawl state '{path}', starting fresh: {e}")
+            return cls(path)
+
+    def should_crawl(self, url, lastmod):
+        """
+        Decides whether url needs crawling: it is new, was never crawled
+        successfully, its <lastmod> changed, or its last crawl is older than
+        INCREMENTAL_RECHECK_DAYS. Remembers lastmod for mark_crawled.
+        """
+        with self._lock:
+            self._seen_lastmods[url] = lastmod
+            entry = self.entries.get(url)
+        if not entry or not entry.get('last_crawled'):
+            return True
+        if lastmod and lastmod != entry.get('lastmod'):
+            return True
+        if settings.INCREMENTAL_RECHECK_DAYS is not None:
+            age = time.time() - entry['last_crawled']
+            if age >= settings.INCREMENTAL_RECHECK_DAYS * 86400:
+                return True
+        return False
+
+    def mark_crawled(self, url):
+        """Records a successful crawl of url now, with the <lastmod> it was discovered with."""
+        with self._lock:
+            previous = self.entries.get(url, {})
+            lastmod = self._seen_lastmods.pop(url, previous.get('lastmod'))
+            self.entries[url] = {'last_crawled': time.time(), 'lastmod': lastmod}
+
+    def save(self):
+        """Writes the state to disk atomically."""
+        with self._lock:
+            data = {'urls': dict(self.entries)}
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+            logging.info(f"Saved crawl state for {len(data['urls'])} URLs to '{self.path}'.")
+        except OSError as e:
+            logging.error(f"Could not save crawl state to '{self.path}': {e}")
+
+
+def select_urls_to_crawl(sitemap_entries, crawl_state):
+    """
+    Filters (page_url, lastmod) tuples from iter_sitemap_entries down to the
+    URLs that need crawling. With INCREMENTAL_CRAWL enabled, pages whose
+    <lastmod> is unchanged since their last successful crawl are skipped;
+    otherwise every URL is yielded. Lazy, so it can feed crawl_and_log_errors directly.
+    """
+    incremental = settings.INCREMENTAL_CRAWL and crawl_state is not None
+    total = selected = 0
+    for url, lastmod in sitemap_entries:
+        total += 1
+        # Always call should_crawl so the state learns each URL's current lastmod
+        changed = crawl_state.should_crawl(url, lastmod) if crawl_state is not None else True
+        if incremental and not changed:
+            continue
+        selected += 1
+        yield url
+    if incremental:
+        logging.info(f"Incremental crawl: {selected} of {total} URLs are new, changed or due for a re-check; {total - selected} skipped.")
+
+
+class CrawlCheckpoint:
+    """
+    Append-only journal of URLs whose results have been written, so an
+    interrupted crawl can be resumed without repeating work. Every line is
+    flushed immediately (survives a crashed process); fsync is batched every
+    CHECKPOINT_FSYNC_EVERY URLs (bounds what an OS crash or reboot can lose).
+    The first line records the sitemap URL the journal belongs to. Thread-safe.
+    """
+
+    HEADER_PREFIX = "# sitemap: "
+
+    def __init__(self, path, sitemap_url, resume=False):
+        self.path = path
+        self.done = set()
+        self._pending_sync = 0
+        self._lock = threading.Lock()
+
+        if resume:
+            journal_sitemap = self.read_sitemap_url(path)
+            if journal_sitemap and journal_sitemap != sitemap_url:
+                logging.warning(f"Checkpoint '{path}' belongs to {journal_sitemap}, not {sitemap_url}; resuming anyway.")
+            self.done = self._load(path)
+            logging.info(f"Resuming crawl: {len(self.done)} URL(s) already completed according to '{path}'.")
+            self._file = open(path, 'a', encoding='utf-8')
+            if journal_sitemap is None:
+                self._file.write(f"{self.HEADER_PREFIX}{sitemap_url}\n")
+            elif not self._ends_with_newline(path):
+                # Terminate a line torn by a crash so the next entry starts cleanly
+                self._file.write("\n")
+        else:
+            # A fresh run starts a fresh journal
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(f"{self.HEADER_PREFIX}{sitemap_url}\n")
+        self._sync()
+
+    @classmethod
+    def read_sitemap_url(cls, path):
+        """Returns the sitemap URL recorded in a checkpoint journal, or None."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                first_line = f.readline().rstrip('\n')
+        except OSError:
+            return None
+        return first_line[len(cls.HEADER_PREFIX):] if first_line.startswith(cls.HEADER_PREFIX) else None
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    @staticmethod
+    def _load(path):
+        done = set()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # A torn last line from a crash simply isn't counted as done
+                    if line.endswith('\n') and not line.startswith('#'):
+                        done.add(line.rstrip('\n'))
+        except FileNotFoundError:
+            pass
+        return done
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending_sync = 0
+
+    def is_done(self, url):
+        """True if url was completed by a previous (resumed) run."""
+        return url in self.done
+
+    def mark_done(self, url):
+        """Appends url to the journal; no-op once the checkpoint is closed."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(url + "\n")
+            self._file.flush()
+            self._pending_sync += 1
+            if self._pending_sync >= settings.CHECKPOINT_FSYNC_EVERY:
+                self._sync()
+
+    def close(self):
+        """Syncs and closes the journal."""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def skip_completed_urls(urls, checkpoint):
+    """
+    Lazily drops URLs already completed according to checkpoint (see --resume).
+    """
+    skipped = 0
+    for url in urls:
+        if checkpoint.is_done(url):
+            skipped += 1
+            continue
+        yield url
+    if skipped:
+        logging.info(f"Skipped {skipped} URL(s) already completed before the crawl was interrupted.")
+
 
-    logging.info(f"Setting up Selenium WebDriver based on settings.py...")
+def build_chrome_options():
+    """
+    Builds the Chrome options used for every WebDriver session, based on settings.py.
+    """
     options = Options()
 
     # Apply Selenium options from settings
@@ -206,173 +780,2358 @@ def crawl_and_log_errors(urls_to_crawl):
 
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
 
+    # 'eager'/'none' stop driver.get from waiting on slow subresources (ads, analytics)
+    options.page_load_strategy = settings.SELENIUM_PAGE_LOAD_STRATEGY
+
     # Enable browser logging to capture console errors based on settings
     options.set_capability("goog:loggingPrefs", {"browser": settings.BROWSER_LOG_LEVEL.upper()}) # Ensure level is uppercase
 
-    driver = None
+    return options
+
+
+@functools.lru_cache(maxsize=None)
+def get_blocked_url_patterns():
+    """
+    Returns the URL patterns to block in every browser session: extension
+    patterns for each type in BLOCK_RESOURCE_TYPES plus BLOCK_URL_PATTERNS.
+    Computed once per process.
+    """
+    patterns = []
+    for resource_type in settings.BLOCK_RESOURCE_TYPES:
+        extensions = RESOURCE_TYPE_EXTENSIONS.get(resource_type)
+        if extensions is None:
+            logging.warning(f"Unknown resource type '{resource_type}' in BLOCK_RESOURCE_TYPES, ignoring.")
+            continue
+        for extension in extensions:
+            # Match with and without a query string (e.g. cache-busting ?ver=1.2)
+            patterns.extend([f"*.{extension}", f"*.{extension}?*"])
+    patterns.extend(settings.BLOCK_URL_PATTERNS)
+    return tuple(patterns)
+
+
+def apply_resource_blocking(driver):
+    """
+    Blocks the configured resource types and URL patterns in the driver's
+    session via the DevTools Network.setBlockedURLs command. Blocked requests
+    are never sent, which speeds up page loads when only console errors matter.
+    """
+    patterns = get_blocked_url_patterns()
+    if not patterns:
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+    logging.debug(f"Blocking {len(patterns)} URL pattern(s) in this browser session.")
+
+
+def measure_transferred_bytes(driver):
+    """
+    Returns the bytes transferred over the network for the current page and its
+    allowed resources (Resource Timing transferSize), or 0 if unavailable.
+    """
     try:
-        logging.info("Installing/Verifying ChromeDriver...")
-        # Ensure the service object is properly defined
-        try:
-            service = Service(ChromeDriverManager().install())
-            logging.info("ChromeDriver is up to date.")
-        except Exception as driver_manager_err:
-             logging.error(f"Failed to download/install ChromeDriver: {driver_manager_err}", exc_info=True)
-             return # Cannot proceed without driver
+        return int(driver.execute_script(PAGE_TRANSFER_SIZE_SCRIPT) or 0)
+    except (WebDriverException, TypeError, ValueError):
+        return 0
 
-        logging.info("Initializing WebDriver...")
-        driver = webdriver.Chrome(service=service, options=options)
 
-        # Set timeouts from settings
-        driver.set_page_load_timeout(settings.SELENIUM_PAGE_LOAD_TIMEOUT)
-        # Implicit waits are generally discouraged with explicit waits, but setting script timeout is fine.
-        driver.set_script_timeout(settings.SELENIUM_SCRIPT_TIMEOUT)
+def measure_navigation_timing(driver):
+    """
+    Returns (HTTP status, time to first byte in ms) of the current page's main
+    document, with None for anything the browser doesn't report.
+    """
+    try:
+        return parse_navigation_timing(driver.execute_script(PAGE_NAVIGATION_TIMING_SCRIPT))
+    except WebDriverException:
+        return None, None
 
-        logging.info("WebDriver setup complete.")
 
-        # Use output directory from settings
-        output_dir = settings.OUTPUT_DIRECTORY
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-            logging.info(f"Saving error logs to directory: '{os.path.abspath(output_dir)}'")
-        except OSError as dir_err:
-            logging.error(f"Could not create output directory '{output_dir}': {dir_err}", exc_info=True)
-            return # Cannot proceed without output directory
+def parse_navigation_timing(value):
+    """Turns the result of PAGE_NAVIGATION_TIMING_SCRIPT into (status, TTFB in ms), with None for missing values."""
+    try:
+        status, ttfb = value
+        return (int(status) if status else None), (float(ttfb) if ttfb and ttfb > 0 else None)
+    except (TypeError, ValueError):
+        return None, None
+
+
+def _load_chromedriver_cache():
+    """Returns the cached ChromeDriver resolution ({'path', 'resolved_at'}) or None."""
+    if not settings.CHROMEDRIVER_CACHE_FILE:
+        return None
+    try:
+        with open(settings.CHROMEDRIVER_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable ChromeDriver cache '{settings.CHROMEDRIVER_CACHE_FILE}': {e}")
+        return None
+    if not cached.get('path') or not os.path.isfile(cached['path']):
+        return None # Driver was removed since it was cached
+    return cached
+
+
+def _save_chromedriver_cache(path):
+    if not settings.CHROMEDRIVER_CACHE_FILE:
+        return
+    temp_path = f"{settings.CHROMEDRIVER_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'resolved_at': time.time()}, f)
+        os.replace(temp_path, settings.CHROMEDRIVER_CACHE_FILE)
+    except OSError as e:
+        logging.warning(f"Could not write ChromeDriver cache '{settings.CHROMEDRIVER_CACHE_FILE}': {e}")
+
+
+def resolve_chromedriver_path():
+    """
+    Returns the path of the ChromeDriver executable, resolving it as cheaply as possible:
+    1. CHROMEDRIVER_PATH, if set.
+    2. The path cached by a previous run, if younger than CHROMEDRIVER_CACHE_MAX_AGE_HOURS
+       (or of any age in CHROMEDRIVER_OFFLINE mode).
+    3. webdriver-manager (version lookup and download), whose result is then cached.
+       If that fails, a stale cached path is used as a fallback.
+    Called once per crawl, so pool workers never race on the download.
+    """
+    if settings.CHROMEDRIVER_PATH:
+        if not os.path.isfile(settings.CHROMEDRIVER_PATH):
+            raise FileNotFoundError(f"CHROMEDRIVER_PATH does not exist: {settings.CHROMEDRIVER_PATH}")
+        logging.info(f"Using ChromeDriver from CHROMEDRIVER_PATH: {settings.CHROMEDRIVER_PATH}")
+        return settings.CHROMEDRIVER_PATH
+
+    cached = _load_chromedriver_cache()
+    if cached:
+        age_hours = (time.time() - cached.get('resolved_at', 0)) / 3600
+        if settings.CHROMEDRIVER_OFFLINE or age_hours < settings.CHROMEDRIVER_CACHE_MAX_AGE_HOURS:
+            logging.info(f"Using cached ChromeDriver (resolved {age_hours:.1f}h ago): {cached['path']}")
+            return cached['path']
+
+    if settings.CHROMEDRIVER_OFFLINE:
+        raise FileNotFoundError("CHROMEDRIVER_OFFLINE is set but no cached ChromeDriver is available; "
+                                "set CHROMEDRIVER_PATH or run once online.")
+
+    try:
+        path = ChromeDriverManager().install()
+    except Exception as driver_manager_err:
+        if cached:
+            logging.warning(f"ChromeDriver lookup failed ({driver_manager_err}), using previously cached driver: {cached['path']}")
+            return cached['path']
+        raise
+    logging.info("ChromeDriver is up to date.")
+    _save_chromedriver_cache(path)
+    return path
+
+
+def create_driver(service, options):
+    """
+    Starts a new Chrome WebDriver session and applies the timeouts and resource
+    blocking from settings.py.
+    """
+    driver = webdriver.Chrome(service=service, options=options)
+
+    # Set timeouts from settings
+    driver.set_page_load_timeout(settings.SELENIUM_PAGE_LOAD_TIMEOUT)
+    # Implicit waits are generally discouraged with explicit waits, but setting script timeout is fine.
+    driver.set_script_timeout(settings.SELENIUM_SCRIPT_TIMEOUT)
+
+    apply_resource_blocking(driver)
+
+    return driver
+
+
+class CdpConsoleCapture:
+    """
+    Captures console output of a WebDriver session in real time over the Chrome
+    DevTools Protocol, as an alternative to polling driver.get_log('browser').
+    Connects to the page target's DevTools websocket and subscribes to
+    Runtime.consoleAPICalled, Runtime.exceptionThrown and Log.entryAdded, so
+    entries are never lost to the log buffer and include full stack traces.
+    Entries use the same dict shape as get_log (level, message, timestamp) and
+    are filtered to BROWSER_LOG_LEVEL.
+    """
 
-        total_urls = len(urls_to_crawl)
-        logging.info(f"Starting crawl of {total_urls} URLs...")
+    CONSOLE_LEVELS = {'error': 'SEVERE', 'assert': 'SEVERE', 'warning': 'WARNING', 'debug': 'DEBUG'}
+    LOG_LEVELS = {'error': 'SEVERE', 'warning': 'WARNING', 'info': 'INFO', 'verbose': 'DEBUG'}
 
-        # Prepare lowercase filter list once
-        filter_list = [str(f).lower() for f in settings.FILTER_LOG_MESSAGES] # Ensure filters are strings
+    def __init__(self, driver):
+        self.driver = driver
+        self._entries = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._closed = False
+        self._min_rank = BROWSER_LOG_LEVEL_RANKS.get(settings.BROWSER_LOG_LEVEL.upper(), 0)
 
-        for i, url in enumerate(urls_to_crawl, 1):
-            logging.info(f"Crawling URL {i}/{total_urls}: {url}")
-            error_log_entries = []
-            filename = sanitize_filename(url)
-            filepath = os.path.join(output_dir, filename)
+        debugger_address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not debugger_address:
+            raise WebDriverException("Chrome did not report a DevTools debugger address.")
+        targets = requests.get(f"http://{debugger_address}/json/list", timeout=settings.REQUESTS_TIMEOUT).json()
+        page_targets = [target for target in targets if target.get('type') == 'page']
+        if not page_targets:
+            raise WebDriverException("No DevTools page target found for the WebDriver session.")
 
+        # suppress_origin avoids Chrome's remote-allow-origins check for non-browser clients
+        self._ws = websocket.create_connection(page_targets[0]['webSocketDebuggerUrl'], suppress_origin=True,
+                                               timeout=settings.REQUESTS_TIMEOUT)
+        self._ws.settimeout(1) # Lets the reader thread notice close()
+        self._send('Runtime.enable')
+        self._send('Log.enable')
+        self._reader = threading.Thread(target=self._read_loop, name='CdpConsoleReader', daemon=True)
+        self._reader.start()
+
+    def _send(self, method, params=None):
+        self._next_id += 1
+        self._ws.send(json.dumps({'id': self._next_id, 'method': method, 'params': params or {}}))
+
+    def _read_loop(self):
+        while not self._closed:
             try:
-                driver.get(url)
-                # Use crawl delay from settings
-                if settings.CRAWL_DELAY > 0:
-                    time.sleep(settings.CRAWL_DELAY)
+                message = json.loads(self._ws.recv())
+            except websocket.WebSocketTimeoutException:
+                continue
+            except (websocket.WebSocketException, OSError, ValueError):
+                break # Browser gone or connection closed
+            entry = self.to_log_entry(message.get('method'), message.get('params', {}))
+            if entry and BROWSER_LOG_LEVEL_RANKS.get(entry['level'], 0) >= self._min_rank:
+                with self._lock:
+                    self._entries.append(entry)
 
-                # Retrieve browser logs (already filtered by level via capabilities)
-                try:
-                    logs = driver.get_log('browser')
-                except WebDriverException as log_err:
-                     # Handle cases where logs might not be available (e.g., browser crashed)
-                     logging.error(f"Could not retrieve browser logs for {url}: {log_err}")
-                     logs = [] # Treat as no logs found
-
-                # Process captured logs
-                for entry in logs:
-                    message = entry.get('message', 'No message content.')
-                    message_lower = message.lower()
-
-                    # Apply custom message filtering from settings
-                    if filter_list and any(filter_text in message_lower for filter_text in filter_list):
-                        continue # Skip this log entry if it matches a filter
-
-                    # Format the message
-                    timestamp_ms = entry.get('timestamp', time.time() * 1000)
-                    timestamp_sec = timestamp_ms / 1000.0
-                    # Handle potential timestamp errors
-                    try:
-                         log_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp_sec))
-                    except ValueError:
-                         log_time = "Invalid Timestamp"
-                    level = entry.get('level', 'UNKNOWN')
-                    # Clean up potential WebDriver noise in message
-                    # message = message.replace('\\n', '\n').replace('\\u003C', '<') # This might break JSON/structured messages
-                    error_log_entries.append(f"[{log_time}] {level} - {message}")
-
-
-                # Decide whether to save the file based on errors found and settings
-                if not error_log_entries and not settings.CREATE_EMPTY_LOG_FILES:
-                    logging.info(f"No relevant console errors ({settings.BROWSER_LOG_LEVEL}) found on {url}, skipping file creation.")
-                    continue # Skip to the next URL
-
-                # Save errors (or no errors message) to the specific file
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        if error_log_entries:
-                            logging.warning(f"Found {len(error_log_entries)} relevant console log(s) (level {settings.BROWSER_LOG_LEVEL}+) on: {url}")
-                            f.write(f"Console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}\n")
-                            f.write("=" * 30 + "\n")
-                            for error in error_log_entries:
-                                f.write(error + "\n\n")
-                        else:
-                            # This part only runs if CREATE_EMPTY_LOG_FILES is True and no relevant logs were found
-                            logging.info(f"No relevant console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}")
-                            f.write(f"No relevant console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}\n")
-                except OSError as write_err:
-                     logging.error(f"Failed to write log file {filepath}: {write_err}")
-                     # Optional: Decide if you want to stop the whole script on a write error
-
-            except TimeoutException:
-                 logging.error(f"Timeout loading page {url} after {settings.SELENIUM_PAGE_LOAD_TIMEOUT} seconds.")
-                 try:
-                     with open(filepath, 'w', encoding='utf-8') as f:
-                         f.write(f"Failed to crawl URL due to timeout: {url}\n")
-                         f.write(f"Timeout limit: {settings.SELENIUM_PAGE_LOAD_TIMEOUT} seconds\n")
-                 except OSError as write_err:
-                     logging.error(f"Failed to write timeout error to log file {filepath}: {write_err}")
-            except WebDriverException as e:
-                # Handle specific common exceptions if needed (e.g., InvalidSessionIdException)
-                logging.error(f"Selenium error navigating to or processing {url}: {e.msg}", exc_info=False) # Keep log cleaner, msg usually sufficient
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(f"Failed to crawl or retrieve logs for URL: {url}\n")
-                        f.write(f"Error Type: {type(e).__name__}\n")
-                        f.write(f"Error Message: {e.msg}\n")
-                except OSError as write_err:
-                    logging.error(f"Failed to write WebDriver error to log file {filepath}: {write_err}")
-            except Exception as e:
-                logging.error(f"Unexpected error processing {url}: {e}", exc_info=True) # Include traceback for unexpected errors
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(f"Unexpected error processing URL: {url}\n")
-                        f.write(f"Error Type: {type(e).__name__}\n")
-                        f.write(f"Error: {e}\n")
-                except OSError as write_err:
-                    logging.error(f"Failed to write unexpected error to log file {filepath}: {write_err}")
+    @staticmethod
+    def _format_stack(call_frames):
+        return "".join(f"\n    at {frame.get('functionName') or '<anonymous>'} "
+                       f"({frame.get('url')}:{frame.get('lineNumber', 0) + 1}:{frame.get('columnNumber', 0) + 1})"
+                       for frame in call_frames)
+
+    @classmethod
+    def to_log_entry(cls, method, params):
+        """Converts a CDP event into a get_log style entry, or None for other events."""
+        if method == 'Runtime.consoleAPICalled':
+            args = params.get('args', [])
+            text = " ".join(str(arg['value']) if 'value' in arg else arg.get('description', arg.get('type', ''))
+                            for arg in args)
+            call_frames = params.get('stackTrace', {}).get('callFrames', [])
+            if call_frames:
+                top = call_frames[0]
+                text = f"{top.get('url')} {top.get('lineNumber', 0) + 1}:{top.get('columnNumber', 0) + 1} {text}"
+            return {'level': cls.CONSOLE_LEVELS.get(params.get('type'), 'INFO'),
+                    'message': text + cls._format_stack(call_frames),
+                    'timestamp': params.get('timestamp', time.time() * 1000),
+                    'source': 'console-api'}
+
+        if method == 'Runtime.exceptionThrown':
+            details = params.get('exceptionDetails', {})
+            # The exception description already contains the full JavaScript stack
+            description = details.get('exception', {}).get('description') or ''
+            text = f"{details.get('text', 'Uncaught')} {description}".strip()
+            if details.get('url'):
+                text = f"{details['url']} {details.get('lineNumber', 0) + 1}:{details.get('columnNumber', 0) + 1} {text}"
+            return {'level': 'SEVERE', 'message': text,
+                    'timestamp': params.get('timestamp', time.time() * 1000), 'source': 'javascript'}
+
+        if method == 'Log.entryAdded':
+            log_entry = params.get('entry', {})
+            text = log_entry.get('text', '')
+            if log_entry.get('url'):
+                text = f"{log_entry['url']} - {text}"
+            return {'level': cls.LOG_LEVELS.get(log_entry.get('level'), 'INFO'), 'message': text,
+                    'timestamp': log_entry.get('timestamp', time.time() * 1000),
+                    'source': log_entry.get('source', 'other')}
+
+        return None
+
+    def clear(self):
+        """Discards captured entries (call before navigating to the next page)."""
+        with self._lock:
+            self._entries = []
+
+    def drain(self):
+        """Returns and removes the entries captured so far, like get_log."""
+        with self._lock:
+            entries, self._entries = self._entries, []
+        return entries
+
+    def close(self):
+        """Stops capturing and closes the DevTools connection."""
+        self._closed = True
+        try:
+            self._ws.close()
+        except Exception:
+            pass
 
+
+def start_console_capture(driver):
+    """
+    Starts a CdpConsoleCapture for the driver if CONSOLE_CAPTURE_BACKEND is 'cdp'.
+    Returns None for the 'get_log' backend, or if the DevTools connection fails
+    (the crawl then falls back to get_log for this session).
+    """
+    if settings.CONSOLE_CAPTURE_BACKEND != 'cdp':
+        return None
+    try:
+        return CdpConsoleCapture(driver)
     except Exception as e:
-        logging.error(f"Failed during WebDriver setup or main loop: {e}", exc_info=True)
-    finally:
-        if driver:
-            logging.info("Closing WebDriver...")
-            try:
-                 driver.quit()
-                 logging.info("WebDriver closed successfully.")
-            except Exception as quit_err:
-                 logging.error(f"Error closing WebDriver: {quit_err}", exc_info=True)
+        logging.error(f"Could not start DevTools console capture, falling back to get_log: {e}")
+        return None
 
 
-# --- Main Execution ---
-if __name__ == "__main__":
-    # Get sitemap URL from user input
-    start_sitemap_url = input("Enter the URL of the WordPress sitemap (e.g., https://example.com/sitemap.xml): ").strip()
+def get_page_ready_states():
+    """
+    Returns the document.readyState values at which a page counts as loaded.
+    With the 'eager' and 'none' page load strategies the crawler does not wait
+    for every subresource: DOMContentLoaded ('interactive') is enough, since
+    most JavaScript errors fire by then.
+    """
+    if settings.SELENIUM_PAGE_LOAD_STRATEGY in ('eager', 'none'):
+        return ('interactive', 'complete')
+    return ('complete',)
 
-    # Basic validation of the input URL format
-    if not start_sitemap_url:
-        print("Error: Sitemap URL cannot be empty.")
-    elif not (start_sitemap_url.startswith('http://') or start_sitemap_url.startswith('https://')):
-        print("Error: Invalid URL format. Please include http:// or https://")
+
+def wait_for_ready_state(driver, timeout):
+    """
+    Waits until document.readyState reaches get_page_ready_states().
+    Raises TimeoutException after timeout seconds.
+    """
+    ready_states = get_page_ready_states()
+    WebDriverWait(driver, timeout, poll_frequency=settings.PAGE_SETTLE_POLL_INTERVAL).until(
+        lambda d: d.execute_script("return document.readyState;") in ready_states
+    )
+
+
+def wait_for_page_settle(driver, read_logs):
+    """
+    Polls the page until it has settled: document.readyState has reached one of
+    get_page_ready_states(), no new resources have been fetched and no new console entries have appeared for
+    PAGE_SETTLE_QUIET_MS, or PAGE_SETTLE_MAX_WAIT seconds have passed.
+    read_logs returns the log entries that arrived since its previous call
+    (get_log and CdpConsoleCapture.drain both behave that way); the entries
+    collected while waiting are returned, including when the page stops
+    answering partway through.
+    """
+    logs = []
+    start = time.monotonic()
+    deadline = start + settings.PAGE_SETTLE_MAX_WAIT
+    quiet_period = settings.PAGE_SETTLE_QUIET_MS / 1000.0
+    last_activity = start
+    last_resource_count = None
+    ready_states = get_page_ready_states()
+
+    while True:
+        try:
+            new_logs = read_logs()
+            ready_state, resource_count = driver.execute_script(PAGE_ACTIVITY_SCRIPT)
+        except WebDriverException as e:
+            if is_dead_session_error(e):
+                raise # Let the caller retry the page in a new browser
+            # Entries already drained from the log buffer can't be read again, so keep them
+            logging.error(f"Page stopped responding while settling, keeping the {len(logs)} log entries collected so far: {e.msg}")
+            return logs
+        now = time.monotonic()
+
+        logs.extend(new_logs)
+        if new_logs or ready_state not in ready_states or resource_count != last_resource_count:
+            last_activity = now
+        last_resource_count = resource_count
+
+        if now - last_activity >= quiet_period:
+            logging.debug(f"Page settled after {now - start:.2f}s.")
+            break
+        if now >= deadline:
+            logging.debug(f"Page did not settle within {settings.PAGE_SETTLE_MAX_WAIT}s, collecting logs anyway.")
+            break
+        time.sleep(settings.PAGE_SETTLE_POLL_INTERVAL)
+
+    return logs
+
+
+def collect_page_logs(driver, url, console_capture=None):
+    """
+    Waits for the loaded page according to PAGE_SETTLE_STRATEGY and returns its
+    browser log entries, read from console_capture (a CdpConsoleCapture) if
+    given, otherwise from driver.get_log. 'settle' waits for network and console
+    quiescence (see wait_for_page_settle); 'fixed' sleeps CRAWL_DELAY seconds
+    before reading the logs.
+    """
+    if console_capture is not None:
+        read_logs = console_capture.drain
     else:
-        # Start the process
-        logging.info(f"Starting sitemap processing for: {start_sitemap_url}")
+        read_logs = lambda: driver.get_log('browser')
 
-        # 1. Get all unique page URLs from the sitemap(s)
-        all_urls = get_all_page_urls(start_sitemap_url)
+    try:
+        if settings.PAGE_SETTLE_STRATEGY == 'settle':
+            return wait_for_page_settle(driver, read_logs)
 
-        if all_urls:
-            logging.info(f"Found {len(all_urls)} unique page URLs in the sitemap(s).")
-            # 2. Crawl each URL and log console errors based on settings
-            crawl_and_log_errors(list(all_urls)) # Convert set to list for ordered iteration (optional, mainly for progress logging)
-            logging.info("Crawling process finished.")
-        else:
+        # Use crawl delay from settings
+        if settings.CRAWL_DELAY > 0:
+            time.sleep(settings.CRAWL_DELAY)
+        return read_logs()
+    except WebDriverException as log_err:
+         if is_dead_session_error(log_err):
+             raise # The browser crashed; crawl_single_url marks the session lost so the page is retried
+         # Handle cases where logs might not be available
+         logging.error(f"Could not retrieve browser logs for {url}: {log_err}")
+         return [] # Treat as no logs found
+
+
+def _normalize_url(match):
+    """Reduces a URL in a console message to the file name it points at, if any."""
+    path = urlparse(match.group(0)).path
+    path = re.sub(r'(?::\d+)+$', '', path) # Stack frames append :line:column
+    file_name = path.rsplit('/', 1)[-1]
+    return f"<url:{file_name}>" if '.' in file_name else "<url>"
+
+
+def normalize_log_message(message):
+    """
+    Strips the parts of a console message that vary between pages and builds
+    (URLs down to their file name, cache-busting query strings, line/column
+    numbers, ids and other numbers), so the same error looks the same everywhere.
+    """
+    message = FINGERPRINT_URL_PATTERN.sub(_normalize_url, message)
+    message = FINGERPRINT_LINE_COL_PATTERN.sub('', message)
+    message = FINGERPRINT_NUMBER_PATTERN.sub('<n>', message)
+    return ' '.join(message.split())
+
+
+def error_fingerprint(level, message):
+    """Returns a short stable id for a console error, equal for the same normalized message and level."""
+    return hashlib.sha1(f"{level}|{normalize_log_message(message)}".encode('utf-8')).hexdigest()[:16]
+
+
+def is_dead_session_error(error):
+    """
+    True if the exception means the WebDriver session itself is gone (Chrome crashed,
+    chromedriver exited), rather than the page failing to load.
+    """
+    if isinstance(error, (InvalidSessionIdException, ConnectionError)):
+        return True
+    message = (getattr(error, 'msg', None) or str(error)).lower()
+    return any(marker in message for marker in DEAD_SESSION_MARKERS)
+
+
+def _substring_trie_pattern(substrings):
+    """
+    Builds a regex matching any of the (lowercase) substrings, with common
+    prefixes factored into a trie, e.g. ['ab', 'ac'] -> 'a(?:b|c)'. Python's
+    regex engine handles that far faster than a flat 'ab|ac|...' alternation.
+    """
+    trie = {}
+    for substring in substrings:
+        node = trie
+        for char in substring:
+            node = node.setdefault(char, {})
+        node[''] = None # End of a substring
+
+    def node_pattern(node):
+        if '' in node:
+            return '' # A shorter substring already matches, longer continuations add nothing
+        branches = [re.escape(char) + node_pattern(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+    return node_pattern(trie)
+
+
+class LogMessageFilter:
+    """
+    Compiled matcher for the FILTER_LOG_MESSAGES rules, built once per run.
+    Rules are case-insensitive substrings by default; 're:' rules are regular
+    expressions searched anywhere in the message, and 'glob:' rules are
+    shell-style patterns (*, ?, [...]) matched against the whole message.
+    Rules of each kind are combined into a single regex (substrings as a prefix
+    trie), so the cost per message barely grows with the number of rules; only
+    regexes that can't be safely joined are searched one by one.
+    """
+
+    def __init__(self, rules):
+        substrings, globs, regexes = [], [], []
+        for rule in rules:
+            rule = str(rule) # Ensure filters are strings
+            if rule.startswith('re:'):
+                try:
+                    regexes.append(re.compile(rule[3:], re.IGNORECASE))
+                except re.error as e:
+                    logging.error(f"Ignoring invalid FILTER_LOG_MESSAGES regex {rule!r}: {e}")
+            elif rule.startswith('glob:'):
+                glob = rule[5:].lower()
+                literal = glob.strip('*')
+                if glob.startswith('*') and glob.endswith('*') and literal and not any(c in literal for c in '*?['):
+                    substrings.append(literal) # '*text*' is just a substring rule
+                else:
+                    globs.append(fnmatch.translate(glob))
+            elif rule:
+                substrings.append(rule.lower())
+        self.rule_count = len(substrings) + len(globs) + len(regexes)
+
+        # Both matched against the lowercased message; globs only ever match from the start
+        self._substring_pattern = re.compile(_substring_trie_pattern(substrings)) if substrings else None
+        self._glob_pattern = re.compile('|'.join(globs)) if globs else None
+        # Lowercasing a regex could change its meaning (\S, \W, ...), so these match case-insensitively instead.
+        # Regexes with groups stay separate (joining them renumbers backreferences and can clash
+        # group names), as do all of them if the joined pattern doesn't compile (e.g. inline flags)
+        self._regex_pattern = None
+        self._separate_regexes = [regex for regex in regexes if regex.groups]
+        combinable = [regex for regex in regexes if not regex.groups]
+        if combinable:
+            try:
+                self._regex_pattern = re.compile('|'.join(f"(?:{regex.pattern})" for regex in combinable), re.IGNORECASE)
+            except re.error:
+                self._separate_regexes = regexes
+
+    def __bool__(self):
+        return self.rule_count > 0
+
+    def matches(self, message):
+        """True if any rule matches the message, i.e. it should be filtered out."""
+        message_lower = message.lower()
+        if self._substring_pattern is not None and self._substring_pattern.search(message_lower):
+            return True
+        if self._glob_pattern is not None and self._glob_pattern.match(message_lower):
+            return True
+        if self._regex_pattern is not None and self._regex_pattern.search(message):
+            return True
+        return any(regex.search(message) for regex in self._separate_regexes)
+
+
+class SuppressionRule:
+    """
+    One SUPPRESSION_RULES entry: a dict with any of 'level' (a level name or
+    list of them), 'message' (regex searched in the message), 'source' (glob for
+    the script/resource URL the message comes from), 'page' (glob for the URL
+    of the crawled page) and 'expires' (YYYY-MM-DD, last day the rule applies).
+    A console entry is suppressed when it matches every condition the rule sets.
+    Matching is case-insensitive. Raises ValueError for an invalid rule, including
+    one with an empty condition.
+    """
+
+    KEYS = {'level', 'message', 'source', 'page', 'expires', 'note'}
+
+    def __init__(self, spec):
+        unknown = set(spec) - self.KEYS
+        if unknown:
+            raise ValueError(f"unknown key(s) {', '.join(sorted(unknown))}")
+        conditions = {'level', 'message', 'source', 'page'} & set(spec)
+        if not conditions:
+            raise ValueError("a rule needs at least one of level, message, source or page")
+        # An empty condition would match everything and silently suppress every console entry
+        empty = [key for key in sorted(conditions) if not spec[key]]
+        if empty:
+            raise ValueError(f"empty value for {', '.join(empty)}")
+        self.spec = spec
+
+        levels = spec.get('level')
+        if isinstance(levels, str):
+            levels = [levels]
+        self.levels = {str(level).upper() for level in levels} if levels else None
+        try:
+            self.message_pattern = re.compile(spec['message'], re.IGNORECASE) if spec.get('message') else None
+        except re.error as e:
+            raise ValueError(f"invalid message regex: {e}") from e
+        self.source_pattern = re.compile(fnmatch.translate(spec['source'].lower())) if spec.get('source') else None
+        self.page_pattern = re.compile(fnmatch.translate(spec['page'].lower())) if spec.get('page') else None
+        try:
+            self.expires = datetime.date.fromisoformat(str(spec['expires'])) if spec.get('expires') else None
+        except ValueError as e:
+            raise ValueError(f"invalid expires date: {e}") from e
+
+    def is_expired(self, today=None):
+        return self.expires is not None and (today or datetime.date.today()) > self.expires
+
+    def applies_to_page(self, page_url):
+        return self.page_pattern is None or self.page_pattern.match(page_url.lower()) is not None
+
+    def matches(self, level, message):
+        """True if a console entry (on a page this rule applies to) should be suppressed."""
+        if self.levels is not None and level.upper() not in self.levels:
+            return False
+        if self.source_pattern is not None:
+            source = SOURCE_URL_PATTERN.match(message)
+            if source is None or not self.source_pattern.match(source.group(0).lower()):
+                return False
+        return self.message_pattern is None or self.message_pattern.search(message) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def get_suppression_rules():
+    """
+    Returns the active SuppressionRules from settings.SUPPRESSION_RULES, skipping
+    (and logging) invalid and expired ones. Computed once per process.
+    """
+    rules = []
+    for index, spec in enumerate(settings.SUPPRESSION_RULES):
+        try:
+            rule = SuppressionRule(spec)
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.error(f"Ignoring invalid SUPPRESSION_RULES entry #{index + 1} {spec!r}: {e}")
+            continue
+        if rule.is_expired():
+            logging.info(f"Skipping expired SUPPRESSION_RULES entry #{index + 1} (expired {rule.expires}): {spec!r}")
+            continue
+        rules.append(rule)
+    return tuple(rules)
+
+
+class HostScheduler:
+    """
+    Per-host politeness for page loads, shared by all workers and tabs of a
+    process. At most max_concurrency pages of a host are navigated to at once
+    (HOST_MAX_CONCURRENCY, or this process's share of it in process mode; pages
+    that are only settling don't count), and page
+    loads on a host start at least its current interval apart (HOST_MIN_INTERVAL
+    when healthy). With HOST_ADAPTIVE_RATE, a host that answers 429/503, times out
+    or slows down (TTFB above HOST_SLOW_TTFB_FACTOR x its usual TTFB) gets half
+    the concurrency and HOST_BACKOFF_FACTOR x the interval; every healthy response
+    ramps it back up towards the configured limits.
+    """
+
+    def __init__(self):
+        self.max_concurrency = settings.HOST_MAX_CONCURRENCY
+        self.hosts = {}
+        self._condition = threading.Condition()
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {
+                'active': 0,
+                'limit': self.max_concurrency or None,  # None = unlimited
+                'interval': settings.HOST_MIN_INTERVAL,
+                'next_start': 0.0,
+                'ttfb_baseline_ms': None,
+                'healthy_streak': 0,
+                'backoffs': 0,
+            }
+        return state
+
+    def acquire(self, url):
+        """Blocks until url's host may start another page load. Returns the host, for release()."""
+        host = urlparse(url).netloc.lower()
+        with self._condition:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                if state['limit'] is not None and state['active'] >= state['limit']:
+                    self._condition.wait() # Until a page of this (or another) host finishes
+                elif now < state['next_start']:
+                    self._condition.wait(state['next_start'] - now)
+                else:
+                    break
+            state['active'] += 1
+            state['next_start'] = now + state['interval']
+        return host
+
+    def release(self, host):
+        """Frees the slot taken by acquire(), once the page has been navigated to (settling doesn't hold it)."""
+        with self._condition:
+            self._state(host)['active'] -= 1
+            self._condition.notify_all()
+
+    def record(self, host, result):
+        """Adapts the host's rate to the result of a page load (see HOST_ADAPTIVE_RATE)."""
+        if not settings.HOST_ADAPTIVE_RATE:
+            return
+        with self._condition:
+            state = self._state(host)
+            reason = self._overload_reason(state, result)
+            if reason:
+                self._back_off(host, state, reason)
+            else:
+                self._ramp_up(state, result.get('ttfb_ms'))
+            self._condition.notify_all()
+
+    @staticmethod
+    def _overload_reason(state, result):
+        if result.get('http_status') in HOST_THROTTLE_STATUSES:
+            return f"answered HTTP {result['http_status']}"
+        if result['status'] == 'timeout':
+            return "timed out"
+        ttfb, baseline = result.get('ttfb_ms'), state['ttfb_baseline_ms']
+        # The absolute floor ignores jitter on fast responses
+        if ttfb and baseline and ttfb > max(baseline * settings.HOST_SLOW_TTFB_FACTOR, 500):
+            return f"slowed down (TTFB {ttfb:.0f} ms, usually {baseline:.0f} ms)"
+        return None
+
+    def _back_off(self, host, state, reason):
+        state['backoffs'] += 1
+        state['healthy_streak'] = 0
+        if state['limit'] is not None:
+            state['limit'] = max(1, state['limit'] // 2)
+        # An interval of 0 can't grow by multiplying, so back off to at least one second
+        state['interval'] = min(settings.HOST_MAX_INTERVAL, max(state['interval'] * settings.HOST_BACKOFF_FACTOR, 1.0))
+        state['next_start'] = max(state['next_start'], time.monotonic() + state['interval'])
+        concurrency = f"{state['limit']} concurrent page(s)" if state['limit'] is not None else "unlimited concurrency"
+        logging.warning(f"Host {host} {reason}; backing off to {concurrency}, {state['interval']:.1f}s apart.")
+
+    def _ramp_up(self, state, ttfb):
+        if ttfb:
+            baseline = state['ttfb_baseline_ms']
+            state['ttfb_baseline_ms'] = ttfb if baseline is None else 0.8 * baseline + 0.2 * ttfb
+        state['interval'] = state['interval'] * settings.HOST_RAMP_UP_FACTOR
+        if state['interval'] < settings.HOST_MIN_INTERVAL + 0.01:
+            state['interval'] = settings.HOST_MIN_INTERVAL
+        state['healthy_streak'] += 1
+        # Additive increase: one more concurrent page after a full round of healthy ones
+        if state['limit'] is not None and state['limit'] < self.max_concurrency \
+                and state['healthy_streak'] >= state['limit']:
+            state['limit'] += 1
+            state['healthy_streak'] = 0
+
+    def log_summary(self):
+        """Logs the hosts that had to be slowed down."""
+        with self._condition:
+            for host, state in sorted(self.hosts.items()):
+                if state['backoffs']:
+                    logging.info(f"Host {host}: backed off {state['backoffs']} time(s); finished at "
+                                 f"{state['limit'] or 'unlimited'} concurrent page(s), {state['interval']:.1f}s apart.")
+
+
+@functools.lru_cache(maxsize=None)
+def get_host_scheduler():
+    """Returns the HostScheduler of this process (each crawl process paces its own page loads)."""
+    return HostScheduler()
+
+
+class _HostSlot:
+    """A slot taken from the HostScheduler; release() is safe to call more than once."""
+
+    def __init__(self, scheduler, host):
+        self.scheduler = scheduler
+        self.host = host
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self.host)
+
+
+def crawl_politely(url, crawl):
+    """
+    Runs crawl(on_navigated) (which loads url, calls on_navigated() once the
+    page has been navigated to and returns its result dict) under the host
+    scheduler: waits for a slot on url's host, frees it when the navigation is
+    done (so settling pages don't hold it), reports the result so the host's
+    rate adapts, and retries pages answered with 429/503 up to
+    HOST_THROTTLE_RETRIES times, after the back-off.
+    """
+    scheduler = get_host_scheduler()
+    for attempt in range(settings.HOST_THROTTLE_RETRIES + 1):
+        slot = _HostSlot(scheduler, scheduler.acquire(url))
+        try:
+            result = crawl(slot.release)
+        finally:
+            slot.release()
+        scheduler.record(slot.host, result)
+        if result.get('http_status') not in HOST_THROTTLE_STATUSES or attempt == settings.HOST_THROTTLE_RETRIES:
+            return result
+        logging.warning(f"{url} answered HTTP {result['http_status']}; retrying after backing off.")
+
+
+def new_crawl_result(url):
+    """Returns the result dictionary for a URL before it is crawled (see crawl_single_url)."""
+    return {'url': url, 'status': 'ok', 'entries': [], 'error_type': None, 'error_message': None,
+            'blocked_requests': 0, 'transferred_bytes': 0, 'suppressed_entries': 0,
+            'http_status': None, 'ttfb_ms': None, 'session_lost': False, 'attempts': 1}
+
+
+def add_log_entries(result, logs, message_filter):
+    """
+    Adds the browser log entries captured for result['url'] (get_log style dicts,
+    already filtered by level) to the result, after dropping blocked requests,
+    FILTER_LOG_MESSAGES matches and entries suppressed by SUPPRESSION_RULES.
+    """
+    blocking_enabled = bool(get_blocked_url_patterns())
+    # Only the suppression rules scoped to this page need checking per entry
+    page_rules = [rule for rule in get_suppression_rules() if rule.applies_to_page(result['url'])]
+
+    for entry in logs:
+        message = entry.get('message', 'No message content.')
+
+        # Requests we blocked on purpose show up as console errors; count them instead
+        if blocking_enabled and BLOCKED_REQUEST_MARKER in message:
+            result['blocked_requests'] += 1
+            continue
+
+        # Apply custom message filtering from settings
+        if message_filter and message_filter.matches(message):
+            continue # Skip this log entry if it matches a filter
+
+        # Scoped suppression rules are checked before anything is built for the entry
+        level = entry.get('level', 'UNKNOWN')
+        if page_rules and any(rule.matches(level, message) for rule in page_rules):
+            result['suppressed_entries'] += 1
+            continue
+
+        # Keep the entry structured; format_log_entry renders it for the text files
+        result['entries'].append({
+            'timestamp': entry.get('timestamp', time.time() * 1000),
+            'level': level,
+            'message': message,
+            'fingerprint': error_fingerprint(level, message),
+        })
+
+
+def crawl_single_url(driver, url, message_filter, console_capture=None, on_navigated=None):
+    """
+    Loads a single URL in the given WebDriver session and captures its console logs
+    (through console_capture, if the session has one). on_navigated, if given, is
+    called once the page has loaded, before it settles.
+    Returns a result dictionary (url, status, entries, error details, and whether the
+    browser session died) instead of raising, so one bad page never stops the crawl.
+    """
+    result = new_crawl_result(url)
+
+    try:
+        if console_capture is not None:
+            console_capture.clear() # Drop late entries from the previous page
+        driver.get(url)
+        if settings.SELENIUM_PAGE_LOAD_STRATEGY == 'none':
+            # driver.get returned immediately; wait until the DOM is ready before settling.
+            # A page that never gets there raises TimeoutException, like driver.get would
+            wait_for_ready_state(driver, settings.SELENIUM_PAGE_LOAD_TIMEOUT)
+        if on_navigated is not None:
+            on_navigated()
+        # Wait for the page to settle and retrieve browser logs (already filtered by level)
+        logs = collect_page_logs(driver, url, console_capture)
+        if get_blocked_url_patterns():
+            result['transferred_bytes'] = measure_transferred_bytes(driver)
+        if settings.HOST_ADAPTIVE_RATE:
+            result['http_status'], result['ttfb_ms'] = measure_navigation_timing(driver)
+
+        # Process captured logs
+        add_log_entries(result, logs, message_filter)
+
+    except TimeoutException:
+         logging.error(f"Timeout loading page {url} after {settings.SELENIUM_PAGE_LOAD_TIMEOUT} seconds.")
+         result['status'] = 'timeout'
+    except WebDriverException as e:
+        # Handle specific common exceptions if needed (e.g., InvalidSessionIdException)
+        logging.error(f"Selenium error navigating to or processing {url}: {e.msg}", exc_info=False) # Keep log cleaner, msg usually sufficient
+        result.update(status='webdriver_error', error_type=type(e).__name__, error_message=e.msg,
+                      session_lost=is_dead_session_error(e))
+    except Exception as e:
+        # A dead chromedriver surfaces as a connection error from the HTTP client, not a WebDriverException
+        session_lost = is_dead_session_error(e)
+        logging.error(f"Unexpected error processing {url}: {e}", exc_info=not session_lost) # Include traceback for unexpected errors
+        result.update(status='error', error_type=type(e).__name__, error_message=str(e), session_lost=session_lost)
+
+    return result
+
+
+def format_log_entry(entry):
+    """Formats a console entry from a crawl result as a line for the per-URL text files."""
+    timestamp_sec = entry['timestamp'] / 1000.0
+    # Handle potential timestamp errors
+    try:
+         log_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp_sec))
+    except (ValueError, OverflowError, OSError):
+         log_time = "Invalid Timestamp"
+    # Clean up potential WebDriver noise in message
+    # message = message.replace('\\n', '\n').replace('\\u003C', '<') # This might break JSON/structured messages
+    return f"[{log_time}] {entry['level']} - {entry['message']}"
+
+
+def write_result_file(result, output_dir):
+    """
+    Saves a crawl result (see crawl_single_url) to the URL's log file in output_dir,
+    honouring CREATE_EMPTY_LOG_FILES.
+    """
+    url = result['url']
+    entries = result['entries']
+    filepath = os.path.join(output_dir, sanitize_filename(url))
+
+    if result['status'] == 'ok':
+        # Decide whether to save the file based on errors found and settings
+        if not entries and not settings.CREATE_EMPTY_LOG_FILES:
+            logging.info(f"No relevant console errors ({settings.BROWSER_LOG_LEVEL}) found on {url}, skipping file creation.")
+            return
+
+        # Save errors (or no errors message) to the specific file
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                if entries:
+                    logging.warning(f"Found {len(entries)} relevant console log(s) (level {settings.BROWSER_LOG_LEVEL}+) on: {url}")
+                    f.write(f"Console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}\n")
+                    f.write("=" * 30 + "\n")
+                    for error in entries:
+                        f.write(format_log_entry(error) + "\n\n")
+                else:
+                    # This part only runs if CREATE_EMPTY_LOG_FILES is True and no relevant logs were found
+                    logging.info(f"No relevant console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}")
+                    f.write(f"No relevant console logs (level {settings.BROWSER_LOG_LEVEL}+) found on: {url}\n")
+        except OSError as write_err:
+             logging.error(f"Failed to write log file {filepath}: {write_err}")
+             # Optional: Decide if you want to stop the whole script on a write error
+        return
+
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            if result['status'] == 'timeout':
+                f.write(f"Failed to crawl URL due to timeout: {url}\n")
+                f.write(f"Timeout limit: {settings.SELENIUM_PAGE_LOAD_TIMEOUT} seconds\n")
+            elif result['status'] == 'webdriver_error':
+                f.write(f"Failed to crawl or retrieve logs for URL: {url}\n")
+                f.write(f"Error Type: {result['error_type']}\n")
+                f.write(f"Error Message: {result['error_message']}\n")
+            else:
+                f.write(f"Unexpected error processing URL: {url}\n")
+                f.write(f"Error Type: {result['error_type']}\n")
+                f.write(f"Error: {result['error_message']}\n")
+    except OSError as write_err:
+        logging.error(f"Failed to write {result['status']} result to log file {filepath}: {write_err}")
+
+
+class JsonlResultStore:
+    """
+    Append-only JSON Lines result store: one crawl result (see crawl_single_url)
+    per line, written in batches. A URL crawled again in a later run is simply
+    appended again; readers use its last line.
+    """
+
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self._pending = []
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def add(self, result):
+        """Buffers one result. Returns True if this flushed the batch to disk."""
+        self._pending.append(json.dumps(dict(result, crawled_at=time.time()), ensure_ascii=False))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Writes the buffered results and syncs the file."""
+        if not self._pending:
+            return
+        self._file.write("\n".join(self._pending) + "\n")
+        self._pending = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    @staticmethod
+    def iter_results(path):
+        """Yields the latest stored result of every URL in the file."""
+        latest = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue # Torn last line of an interrupted run
+                latest[result['url']] = result
+        yield from latest.values()
+
+
+class SqliteResultStore:
+    """
+    SQLite result store with one row per URL in `pages` and one row per console
+    entry in `console_entries`, indexed by url, level and message for querying.
+    Results are written in batched transactions; a URL crawled again replaces
+    its previous rows.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            crawled_at REAL NOT NULL,
+            attempts INTEGER,
+            error_type TEXT,
+            error_message TEXT,
+            blocked_requests INTEGER,
+            transferred_bytes INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS console_entries (
+            url TEXT NOT NULL,
+            timestamp REAL,
+            level TEXT,
+            message TEXT,
+            fingerprint TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_pages_status ON pages (status);
+        CREATE INDEX IF NOT EXISTS idx_console_entries_url ON console_entries (url);
+        CREATE INDEX IF NOT EXISTS idx_console_entries_level ON console_entries (level);
+        CREATE INDEX IF NOT EXISTS idx_console_entries_message ON console_entries (message);
+        CREATE INDEX IF NOT EXISTS idx_console_entries_fingerprint ON console_entries (fingerprint);
+    """
+
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self._pending = []
+        # Opened by the main thread, then only used from the ResultWriter thread (one call at a time),
+        # so sqlite3's same-thread check has to be off but no locking is needed
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(console_entries)")]
+        if columns and 'fingerprint' not in columns:
+            # Databases written before error fingerprinting existed
+            self._connection.execute("ALTER TABLE console_entries ADD COLUMN fingerprint TEXT")
+        self._connection.executescript(self.SCHEMA)
+
+    def add(self, result):
+        """Buffers one result. Returns True if this committed the batch."""
+        self._pending.append(dict(result, crawled_at=time.time()))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Writes the buffered results in a single transaction."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        with self._connection:
+            urls = [(result['url'],) for result in pending]
+            self._connection.executemany("DELETE FROM console_entries WHERE url = ?", urls)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r['url'], r['status'], r['crawled_at'], r.get('attempts', 1), r['error_type'], r['error_message'],
+                  r.get('blocked_requests', 0), r.get('transferred_bytes', 0)) for r in pending])
+            self._connection.executemany(
+                "INSERT INTO console_entries VALUES (?, ?, ?, ?, ?)",
+                [(r['url'], e['timestamp'], e['level'], e['message'], e.get('fingerprint'))
+                 for r in pending for e in r['entries']])
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    @staticmethod
+    def iter_results(path):
+        """Yields every stored result, in the same shape as crawl_single_url returns."""
+        connection = sqlite3.connect(path)
+        connection.row_factory = sqlite3.Row
+        try:
+            for page in connection.execute("SELECT * FROM pages ORDER BY url").fetchall():
+                result = dict(page)
+                result['entries'] = [dict(entry) for entry in connection.execute(
+                    "SELECT timestamp, level, message, fingerprint FROM console_entries WHERE url = ? ORDER BY rowid", (page['url'],))]
+                yield result
+        finally:
+            connection.close()
+
+
+RESULT_STORES = {'jsonl': (JsonlResultStore, 'results.jsonl'), 'sqlite': (SqliteResultStore, 'results.sqlite3')}
+
+
+def get_result_store_path(output_dir):
+    """Returns the RESULT_STORE file path (RESULT_STORE_FILE or its default inside output_dir)."""
+    _, default_name = RESULT_STORES[settings.RESULT_STORE]
+    return settings.RESULT_STORE_FILE or os.path.join(output_dir, default_name)
+
+
+def open_result_store(output_dir):
+    """
+    Opens the structured result store selected by RESULT_STORE, or returns None
+    when results are only written as per-URL text files ('files').
+    """
+    if settings.RESULT_STORE == 'files':
+        return None
+    if settings.RESULT_STORE not in RESULT_STORES:
+        logging.warning(f"Unknown RESULT_STORE '{settings.RESULT_STORE}', writing per-URL log files instead.")
+        return None
+    store_class, _ = RESULT_STORES[settings.RESULT_STORE]
+    path = get_result_store_path(output_dir)
+    logging.info(f"Saving crawl results to {settings.RESULT_STORE} store: '{os.path.abspath(path)}'")
+    return store_class(path, settings.RESULT_STORE_BATCH_SIZE)
+
+
+def export_log_files(output_dir):
+    """
+    Writes the per-URL text log files into output_dir from the RESULT_STORE file
+    of a previous crawl. Returns the number of results exported.
+    """
+    store_class, _ = RESULT_STORES[settings.RESULT_STORE]
+    path = get_result_store_path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    for result in store_class.iter_results(path):
+        write_result_file(result, output_dir)
+        count += 1
+    return count
+
+
+class ErrorIndex:
+    """
+    Deduplicated index of the console errors found in a crawl: for every
+    fingerprint (see error_fingerprint) its normalized message, one sample
+    message, the number of occurrences and affected pages, and up to max_urls
+    of those pages. Only used from the ResultWriter thread, so it is not locked.
+    """
+
+    def __init__(self, path, max_urls=100):
+        self.path = path
+        self.max_urls = max_urls
+        self.errors = {}
+
+    def add(self, result):
+        """Adds the console entries of one crawl result."""
+        for entry in result['entries']:
+            fingerprint = entry.get('fingerprint') or error_fingerprint(entry['level'], entry['message'])
+            error = self.errors.get(fingerprint)
+            if error is None:
+                error = self.errors[fingerprint] = {
+                    'fingerprint': fingerprint,
+                    'level': entry['level'],
+                    'normalized_message': normalize_log_message(entry['message']),
+                    'sample_message': entry['message'],
+                    'occurrences': 0,
+                    'page_count': 0,
+                    'urls': [],
+                    '_last_url': None,
+                }
+            error['occurrences'] += 1
+            if error['_last_url'] != result['url']: # Entries of one page arrive together
+                error['_last_url'] = result['url']
+                error['page_count'] += 1
+                if len(error['urls']) < self.max_urls:
+                    error['urls'].append(result['url'])
+
+    def ranked(self):
+        """Returns the errors, most widespread first."""
+        errors = [{k: v for k, v in error.items() if k != '_last_url'} for error in self.errors.values()]
+        return sorted(errors, key=lambda error: (-error['page_count'], -error['occurrences']))
+
+    def save(self):
+        """Writes the index to disk atomically."""
+        data = {'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'errors': self.ranked()}
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            logging.info(f"Saved index of {len(data['errors'])} distinct console error(s) to '{self.path}'.")
+        except OSError as e:
+            logging.error(f"Could not save error index to '{self.path}': {e}")
+
+    def log_top(self, count=5):
+        """Logs the most widespread errors."""
+        for error in self.ranked()[:count]:
+            logging.info(f"  {error['page_count']} page(s), {error['occurrences']}x [{error['fingerprint']}] "
+                         f"{error['level']} - {error['normalized_message'][:200]}")
+
+
+class ResultWriter:
+    """
+    Dedicated writer thread that persists crawl results, so browser workers
+    never wait on the filesystem. Results are queued by submit() and written to
+    result_store and/or per-URL text files in the background; the queue is
+    bounded (RESULT_WRITER_QUEUE_SIZE), so a disk that can't keep up slows the
+    crawl down instead of filling memory. Successful crawls are recorded in
+    crawl_state, every persisted result in checkpoint and all console errors
+    in error_index (an ErrorIndex), if given.
+    """
+
+    def __init__(self, output_dir, crawl_state=None, checkpoint=None, result_store=None, error_index=None):
+        self.output_dir = output_dir
+        self.crawl_state = crawl_state
+        self.checkpoint = checkpoint
+        self.result_store = result_store
+        self.error_index = error_index
+        self._unflushed_urls = [] # Stored but not yet on disk, so not yet journaled
+        self._queue = queue.Queue(maxsize=max(1, int(settings.RESULT_WRITER_QUEUE_SIZE)))
+        # Started with the first result, so crawl processes are forked before it exists: a child
+        # forked while this thread holds a lock (logging, file handles) could deadlock on it
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ResultWriter", daemon=True)
+                self._thread.start()
+
+    def submit(self, result):
+        """Queues one result for writing; blocks only while the queue is full."""
+        self._ensure_started()
+        self._queue.put(result)
+
+    def close(self):
+        """Writes everything still queued, then flushes and closes the result store."""
+        self._ensure_started() # Still closes the store and saves the error index after an empty crawl
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                # Flush when idle, so the store and checkpoint don't lag behind a slow crawl
+                result = self._queue.get(timeout=settings.RESULT_WRITER_FLUSH_INTERVAL)
+            except queue.Empty:
+                self._flush()
+                continue
+            if result is None:
+                break
+            try:
+                self._write(result)
+            except Exception as e:
+                # Keep draining the queue, or the workers would block on it forever
+                logging.error(f"Failed to save result for {result['url']}: {e}", exc_info=True)
+        try:
+            if self.result_store is not None:
+                self.result_store.close()
+                self._journal()
+        except Exception as e:
+            logging.error(f"Failed to close the result store: {e}", exc_info=True)
+        if self.error_index is not None:
+            self.error_index.save()
+
+    def _write(self, result):
+        if self.result_store is None or settings.EXPORT_LOG_FILES:
+            write_result_file(result, self.output_dir)
+        if self.crawl_state is not None and result['status'] == 'ok':
+            self.crawl_state.mark_crawled(result['url'])
+        if self.error_index is not None:
+            self.error_index.add(result)
+        # Journal only after the result is on disk, so a resumed run never loses it
+        self._unflushed_urls.append(result['url'])
+        if self.result_store is None or self.result_store.add(result):
+            self._journal()
+
+    def _flush(self):
+        if self.result_store is not None and self._unflushed_urls:
+            try:
+                self.result_store.flush()
+            except Exception as e:
+                logging.error(f"Failed to flush the result store: {e}", exc_info=True)
+                return
+            self._journal()
+
+    def _journal(self):
+        if self.checkpoint is not None:
+            for url in self._unflushed_urls:
+                self.checkpoint.mark_done(url)
+        self._unflushed_urls = []
+
+
+class ResultAggregator:
+    """
+    Collects per-URL crawl results from all workers (threads or processes),
+    hands them to a ResultWriter and keeps running totals for the end-of-crawl
+    summary. Safe to call from several threads. total_urls stays None until URL
+    discovery has finished. Call close() when done.
+    """
+
+    def __init__(self, output_dir, total_urls=None, crawl_state=None, checkpoint=None, result_store=None, error_index=None):
+        self.output_dir = output_dir
+        self.total_urls = total_urls
+        self.error_index = error_index
+        self.writer = ResultWriter(output_dir, crawl_state, checkpoint, result_store, error_index)
+        self.completed = 0
+        self.status_counts = {}
+        self.blocked_requests = 0
+        self.transferred_bytes = 0
+        self.suppressed_entries = 0
+        self._lock = threading.Lock()
+
+    def progress(self, i):
+        """Formats a progress counter, including the total once it is known."""
+        return f"{i}/{self.total_urls}" if self.total_urls is not None else str(i)
+
+    def handle(self, result):
+        """Queues one result for writing and updates the running totals."""
+        self.writer.submit(result)
+        with self._lock:
+            self.completed += 1
+            self.status_counts[result['status']] = self.status_counts.get(result['status'], 0) + 1
+            self.blocked_requests += result.get('blocked_requests', 0)
+            self.transferred_bytes += result.get('transferred_bytes', 0)
+            self.suppressed_entries += result.get('suppressed_entries', 0)
+
+    def close(self):
+        """Waits for all queued results to be written."""
+        self.writer.close()
+
+    def log_summary(self):
+        """Logs the totals collected so far."""
+        counts = ", ".join(f"{status}: {count}" for status, count in sorted(self.status_counts.items()))
+        logging.info(f"Crawled {self.progress(self.completed)} URLs ({counts or 'no results'}).")
+        if get_blocked_url_patterns():
+            logging.info(f"Resource blocking: {self.blocked_requests} request(s) blocked; "
+                         f"allowed resources transferred {self.transferred_bytes / (1024 * 1024):.1f} MB "
+                         f"(avg {self.transferred_bytes / max(self.completed, 1) / 1024:.0f} KB per page).")
+        if self.suppressed_entries:
+            logging.info(f"Suppression rules dropped {self.suppressed_entries} console entr{'y' if self.suppressed_entries == 1 else 'ies'}.")
+        if self.error_index is not None and self.error_index.errors:
+            logging.info(f"Found {len(self.error_index.errors)} distinct console error(s); most widespread:")
+            self.error_index.log_top()
+        missing = (self.total_urls or 0) - self.completed
+        if missing > 0:
+            logging.error(f"{missing} URL(s) were not crawled because their browser sessions failed.")
+
+
+def _feed_url_queues(urls_to_crawl, url_queues, workers_per_queue, aggregator):
+    """
+    Feeder thread: distributes URLs round-robin over the worker queues as the
+    (possibly lazy) iterable yields them, then puts one None per worker on each
+    queue to signal the end of the input. Sets aggregator.total_urls when done.
+    """
+    count = 0
+    try:
+        for url in urls_to_crawl:
+            count += 1
+            url_queues[(count - 1) % len(url_queues)].put((count, url))
+    except Exception as e:
+        logging.error(f"URL discovery failed after {count} URL(s): {e}", exc_info=True)
+    finally:
+        aggregator.total_urls = count
+        logging.info(f"URL discovery finished: {count} unique URL(s) queued for crawling.")
+        for url_queue in url_queues:
+            for _ in range(workers_per_queue):
+                url_queue.put(None)
+
+
+class BrowserSession:
+    """
+    One Chrome WebDriver session (its own chromedriver process) together with
+    its optional DevTools console capture and the counters used by the
+    session recycling policy.
+    """
+
+    def __init__(self, service_path, options):
+        self.driver = create_driver(Service(service_path), options)
+        self.console_capture = start_console_capture(self.driver)
+        self.pages_crawled = 0
+        self.consecutive_errors = 0
+
+    def crawl(self, url, message_filter):
+        """Crawls one URL in this session (see crawl_single_url, crawl_politely) and updates the counters."""
+        result = crawl_politely(url, lambda on_navigated: crawl_single_url(
+            self.driver, url, message_filter, self.console_capture, on_navigated))
+        self.pages_crawled += 1
+        if result['status'] == 'webdriver_error':
+            self.consecutive_errors += 1
+        else:
+            self.consecutive_errors = 0
+        return result
+
+    def memory_mb(self):
+        """
+        Returns the resident memory (MB) of chromedriver and all browser processes
+        it started, or None if psutil is not installed or the processes are gone.
+        """
+        if psutil is None:
+            return None
+        try:
+            driver_process = psutil.Process(self.driver.service.process.pid)
+            processes = [driver_process] + driver_process.children(recursive=True)
+        except (psutil.Error, AttributeError):
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass # Renderer exited while we were measuring
+        return total / (1024 * 1024)
+
+    def recycle_reason(self):
+        """Returns why this session should be replaced according to settings.py, or None."""
+        if settings.SESSION_RECYCLE_PAGES and self.pages_crawled >= settings.SESSION_RECYCLE_PAGES:
+            return f"reached {self.pages_crawled} pages"
+        if settings.SESSION_RECYCLE_CONSECUTIVE_ERRORS and self.consecutive_errors >= settings.SESSION_RECYCLE_CONSECUTIVE_ERRORS:
+            return f"{self.consecutive_errors} consecutive WebDriver errors"
+        if settings.SESSION_RECYCLE_MAX_RSS_MB:
+            memory_mb = self.memory_mb()
+            if memory_mb is not None and memory_mb >= settings.SESSION_RECYCLE_MAX_RSS_MB:
+                return f"memory use {memory_mb:.0f} MB"
+        return None
+
+    def nearing_recycle(self):
+        """True once a planned (page count) recycle is within SESSION_WARM_SPARE_LEAD pages."""
+        return bool(settings.SESSION_RECYCLE_PAGES) and \
+            self.pages_crawled >= settings.SESSION_RECYCLE_PAGES - settings.SESSION_WARM_SPARE_LEAD
+
+    def close(self):
+        """Stops the console capture and quits the browser; errors are logged, not raised."""
+        if self.console_capture is not None:
+            self.console_capture.close()
+        try:
+            self.driver.quit()
+        except Exception as quit_err:
+            logging.error(f"Error closing WebDriver: {quit_err}", exc_info=True)
+
+
+class RecyclingBrowserSession:
+    """
+    The browser used by one pool worker. Wraps a BrowserSession and replaces it
+    whenever its recycle_reason() says so, bounding Chrome's memory growth over
+    long crawls. With SESSION_WARM_SPARE enabled, the replacement is started in
+    the background ahead of a planned recycle, so switching sessions does not
+    stall the crawl.
+    """
+
+    def __init__(self, worker_name, service_path, options):
+        self.worker_name = worker_name
+        self.service_path = service_path
+        self.options = options
+        self.sessions_started = 1
+        self.session = BrowserSession(service_path, options)
+        self._spare = None
+        self._recycle_reason = None # Planned recycle, done before the next page
+        # Starts spares and quits retired sessions off the crawl path
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{worker_name}-Spare")
+
+    def crawl(self, url, message_filter):
+        """
+        Crawls one URL. If the browser dies while loading the page, a new session
+        is started and the URL is retried, up to CRASH_RETRY_ATTEMPTS extra times.
+        A recycle the policy asks for afterwards is deferred to the next call, so a
+        replacement browser that fails to start never costs an already crawled page.
+        """
+        if self._recycle_reason:
+            reason, self._recycle_reason = self._recycle_reason, None
+            self.recycle(reason)
+
+        attempt = 1
+        result = self.session.crawl(url, message_filter)
+        while result['session_lost']:
+            # Never reuse a dead session, even when out of retries, or every later URL fails too
+            self.recycle(f"session lost ({result['error_type']})")
+            if attempt > settings.CRASH_RETRY_ATTEMPTS:
+                logging.error(f"[{self.worker_name}] Giving up on {url} after {attempt} attempt(s); the browser crashed each time.")
+                return result
+            attempt += 1
+            logging.warning(f"[{self.worker_name}] Retrying {url} in a new browser session (attempt {attempt}).")
+            result = self.session.crawl(url, message_filter)
+            result['attempts'] = attempt
+
+        self._recycle_reason = self.session.recycle_reason()
+        if not self._recycle_reason and settings.SESSION_WARM_SPARE and self._spare is None \
+                and self.session.nearing_recycle():
+            logging.debug(f"[{self.worker_name}] Starting warm spare browser session...")
+            self._spare = self._background.submit(BrowserSession, self.service_path, self.options)
+        return result
+
+    def recycle(self, reason):
+        """Replaces the current session with the warm spare (if ready) or a new one."""
+        logging.info(f"[{self.worker_name}] Recycling browser session after {self.session.pages_crawled} page(s): {reason}.")
+        old_session = self.session
+        self._background.submit(old_session.close)
+        self.session = None
+
+        spare, self._spare = self._spare, None
+        if spare is not None:
+            try:
+                self.session = spare.result() # Usually ready already
+            except Exception as e:
+                logging.error(f"[{self.worker_name}] Warm spare session failed to start: {e}")
+        # A crash can leave Chrome briefly unable to start again, so allow a few tries
+        for start_attempt in range(1, settings.CRASH_RESTART_ATTEMPTS + 1):
+            if self.session is not None:
+                break
+            try:
+                self.session = BrowserSession(self.service_path, self.options)
+            except Exception as e:
+                if start_attempt == settings.CRASH_RESTART_ATTEMPTS:
+                    raise
+                logging.warning(f"[{self.worker_name}] Could not start a new browser session (attempt {start_attempt}): {e}")
+                time.sleep(start_attempt)
+        self.sessions_started += 1
+
+    def close(self):
+        """Closes the current session and any spare, waiting for background work to finish."""
+        if self.session is not None:
+            self._background.submit(self.session.close)
+        if self._spare is not None:
+            # Runs after the spare's start job on the single background thread
+            self._background.submit(self._close_spare, self._spare)
+            self._spare = None
+        self._background.shutdown(wait=True)
+
+    @staticmethod
+    def _close_spare(spare):
+        if spare.exception() is None:
+            spare.result().close()
+
+
+def _crawl_worker(worker_name, url_queue, service_path, options, message_filter, aggregator):
+    """
+    Thread pool worker: owns one (recycling) browser session and crawls URLs from
+    the shared queue until it receives None (in TABS_PER_BROWSER tabs, see
+    _crawl_in_tabs). Any failure is contained to this worker; the remaining
+    workers keep draining the queue.
+    """
+    browser = None
+    crawled = 0
+    try:
+        logging.info(f"[{worker_name}] Initializing WebDriver...")
+        browser = RecyclingBrowserSession(worker_name, service_path, options)
+
+        if settings.TABS_PER_BROWSER > 1:
+            crawled = _crawl_in_tabs(worker_name, browser, url_queue, message_filter,
+                                     aggregator.handle, aggregator.progress)
+            return
+
+        # Blocks while discovery is still producing URLs
+        for i, url in iter(url_queue.get, None):
+            logging.info(f"[{worker_name}] Crawling URL {aggregator.progress(i)}: {url}")
+            aggregator.handle(browser.crawl(url, message_filter))
+            crawled += 1
+
+    except Exception as e:
+        logging.error(f"[{worker_name}] Worker stopped after {crawled} URL(s): {e}", exc_info=True)
+    finally:
+        sessions = ""
+        if browser is not None:
+            logging.info(f"[{worker_name}] Closing WebDriver...")
+            browser.close()
+            sessions = f" using {browser.sessions_started} browser session(s)"
+        logging.info(f"[{worker_name}] Finished, crawled {crawled} URL(s){sessions}.")
+
+
+def _crawl_process_worker(worker_name, url_queue, service_path, message_filter, result_queue, host_max_concurrency):
+    """
+    Process pool worker: owns one (recycling) browser session, crawls the shard of
+    URLs fed to its own queue until it receives None, and streams each result back
+    to the parent through result_queue. A final None tells the parent this worker is done.
+    host_max_concurrency is this process's share of HOST_MAX_CONCURRENCY.
+    """
+    browser = None
+    crawled = 0
+    get_host_scheduler().max_concurrency = host_max_concurrency
+    try:
+        logging.info(f"[{worker_name}] Initializing WebDriver...")
+        # Options are rebuilt in the child so nothing Selenium-specific needs pickling
+        browser = RecyclingBrowserSession(worker_name, service_path, build_chrome_options())
+
+        if settings.TABS_PER_BROWSER > 1:
+            crawled = _crawl_in_tabs(worker_name, browser, url_queue, message_filter, result_queue.put, str)
+            return
+
+        for i, url in iter(url_queue.get, None):
+            logging.info(f"[{worker_name}] Crawling URL {i}: {url}")
+            result_queue.put(browser.crawl(url, message_filter))
+            crawled += 1
+
+    except Exception as e:
+        logging.error(f"[{worker_name}] Worker stopped after {crawled} URL(s): {e}", exc_info=True)
+    finally:
+        sessions = ""
+        if browser is not None:
+            logging.info(f"[{worker_name}] Closing WebDriver...")
+            browser.close()
+            sessions = f" using {browser.sessions_started} browser session(s)"
+        logging.info(f"[{worker_name}] Finished, crawled {crawled} URL(s){sessions}.")
+        result_queue.put(None)
+
+
+class SessionTabBrowser:
+    """
+    The Chrome of a RecyclingBrowserSession, driven over its DevTools websocket
+    for tab mode (TABS_PER_BROWSER > 1) with the same interface as
+    AsyncChromeBrowser. If Chrome dies, the DevTools connection drops and every
+    tab reports its page as session lost; the next new_tab() then recycles the
+    Selenium session and re-attaches, so the tab workers' crash retries run in a
+    fresh browser. executor runs the blocking recycle off the event loop.
+    """
+
+    def __init__(self, worker_name, session, executor):
+        self.worker_name = worker_name
+        self.session = session
+        self.executor = executor
+        self.browser = None
+        self._lock = None
+
+    async def _attach(self):
+        driver = self.session.session.driver
+        debugger_address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not debugger_address:
+            raise WebDriverException("Chrome did not report a DevTools debugger address.")
+        self.browser = await AsyncChromeBrowser.attach(debugger_address)
+
+    async def new_tab(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Only the first tab to notice a lost browser replaces it; the others wait and reuse the new one
+        async with self._lock:
+            if self.browser is None:
+                await self._attach()
+            elif self.browser.connection.closed:
+                await self.browser.close()
+                self.browser = None
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.session.recycle, "DevTools connection lost")
+                await self._attach()
+        return await self.browser.new_tab()
+
+    async def close(self):
+        """Disconnects from Chrome; the RecyclingBrowserSession still owns (and closes) it."""
+        if self.browser is not None:
+            await self.browser.close()
+
+
+def _crawl_in_tabs(worker_name, session, url_queue, message_filter, handle_result, progress):
+    """
+    Crawls URLs from url_queue in TABS_PER_BROWSER concurrent tabs of the Chrome
+    behind a RecyclingBrowserSession, until every tab has received None. The tabs
+    are driven over the browser's DevTools websocket (see SessionTabBrowser,
+    AsyncTab), each with its own console capture, so one Chrome process serves
+    several pages at a time. handle_result receives each result; progress
+    formats the URL counter. Returns the number of URLs crawled.
+    """
+    tab_count = settings.TABS_PER_BROWSER
+
+    async def crawl_tabs():
+        executor = ThreadPoolExecutor(max_workers=tab_count, thread_name_prefix=f"{worker_name}-URLQueue")
+        browser = SessionTabBrowser(worker_name, session, executor)
+        try:
+            counts = await asyncio.gather(*(
+                _async_tab_worker(f"{worker_name}-Tab-{n}", browser, url_queue, executor, message_filter,
+                                  handle_result, progress)
+                for n in range(1, tab_count + 1)
+            ))
+        finally:
+            await browser.close()
+            executor.shutdown(wait=False)
+        return sum(counts)
+
+    logging.info(f"[{worker_name}] Crawling in {tab_count} tabs of this browser...")
+    return asyncio.run(crawl_tabs())
+
+
+def _run_thread_pool(urls_to_crawl, pool_size, service_path, message_filter, aggregator):
+    """
+    Crawls the URLs with pool_size threads pulling from one shared queue, which
+    is filled by a feeder thread as URLs are discovered.
+    """
+    options = build_chrome_options()
+    url_queue = queue.Queue()
+
+    # Every tab of every worker stops at its own None
+    feeder = threading.Thread(target=_feed_url_queues, name='URLFeeder',
+                              args=(urls_to_crawl, [url_queue], pool_size * settings.TABS_PER_BROWSER, aggregator),
+                              daemon=True)
+    feeder.start()
+
+    workers = []
+    for n in range(1, pool_size + 1):
+        worker_name = f"Worker-{n}"
+        # Every browser session starts its own chromedriver process from service_path
+        worker = threading.Thread(
+            target=_crawl_worker,
+            name=worker_name,
+            args=(worker_name, url_queue, service_path, options, message_filter, aggregator),
+            daemon=True,
+        )
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+    feeder.join()
+
+
+def _run_process_pool(urls_to_crawl, pool_size, service_path, message_filter, aggregator):
+    """
+    Shards the URLs across pool_size processes as they are discovered and
+    aggregates the results they stream back. Output files are written by the
+    parent only. The processes are started before the feeder thread (and before
+    the first result starts the ResultWriter thread), so no other thread is
+    running when they are forked.
+    """
+    # Each process paces its own page loads, so split the per-host limit between them
+    host_max_concurrency = settings.HOST_MAX_CONCURRENCY
+    if host_max_concurrency:
+        host_max_concurrency = max(1, host_max_concurrency // pool_size)
+        if host_max_concurrency * pool_size > settings.HOST_MAX_CONCURRENCY:
+            logging.warning(f"HOST_MAX_CONCURRENCY = {settings.HOST_MAX_CONCURRENCY} is below BROWSER_POOL_SIZE = {pool_size} "
+                            f"in process mode: each process loads at most one page per host at a time, so up to "
+                            f"{pool_size} can load at once, and back-off is tracked per process. "
+                            f"Use the 'thread' mode for a shared limit.")
+        else:
+            logging.info(f"Limiting each crawl process to {host_max_concurrency} concurrent page(s) per host.")
+
+    result_queue = multiprocessing.Queue()
+    url_queues = []
+    processes = []
+    for n in range(pool_size):
+        worker_name = f"Process-{n + 1}"
+        url_queue = multiprocessing.Queue()
+        # Don't block interpreter exit on URLs left over by a crashed worker
+        url_queue.cancel_join_thread()
+        process = multiprocessing.Process(
+            target=_crawl_process_worker,
+            name=worker_name,
+            args=(worker_name, url_queue, service_path, message_filter, result_queue, host_max_concurrency),
+        )
+        process.start()
+        url_queues.append(url_queue)
+        processes.append(process)
+
+    # Round-robin sharding keeps shards balanced even if URLs are grouped by section
+    feeder = threading.Thread(target=_feed_url_queues, name='URLFeeder',
+                              args=(urls_to_crawl, url_queues, settings.TABS_PER_BROWSER, aggregator), daemon=True)
+    feeder.start()
+
+    finished = 0
+    while finished < len(processes):
+        try:
+            result = result_queue.get(timeout=1)
+        except queue.Empty:
+            # A worker killed hard (e.g., OOM) never sends its final None
+            if not any(process.is_alive() for process in processes):
+                logging.error("All crawl processes exited before reporting completion.")
+                break
+            continue
+        if result is None:
+            finished += 1
+            continue
+        logging.info(f"Result {aggregator.progress(aggregator.completed + 1)} ({result['status']}): {result['url']}")
+        aggregator.handle(result)
+
+    feeder.join()
+    for process in processes:
+        process.join()
+
+
+def find_chrome_binary():
+    """
+    Returns the Chrome executable for the asyncio engine: CHROME_BINARY_PATH if
+    set, otherwise the first of CHROME_BINARY_CANDIDATES that exists.
+    """
+    if settings.CHROME_BINARY_PATH:
+        return settings.CHROME_BINARY_PATH
+    for candidate in CHROME_BINARY_CANDIDATES:
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    raise FileNotFoundError("Chrome executable not found; set CHROME_BINARY_PATH in settings.py.")
+
+
+class AsyncCdpConnection:
+    """
+    Asyncio DevTools Protocol connection to the browser target, shared by all
+    tabs. Commands to different tabs are multiplexed over the one websocket by
+    message id and flattened target session id; events are dispatched to the
+    handler registered for their session. Failed commands raise
+    WebDriverException; a lost connection raises ConnectionError.
+    """
+
+    def __init__(self, ws):
+        self._ws = ws
+        self._next_id = 0
+        self._pending = {}
+        self._handlers = {}
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @property
+    def closed(self):
+        return self._reader.done()
+
+    @classmethod
+    async def connect(cls, url):
+        # Chrome sends large messages (e.g. long stack traces); don't cap them
+        ws = await websockets.connect(url, max_size=None, ping_interval=None)
+        return cls(ws)
+
+    async def send(self, method, params=None, session_id=None, timeout=None):
+        """Sends a command and returns its result, waiting at most timeout (default SELENIUM_SCRIPT_TIMEOUT) seconds."""
+        if self.closed:
+            raise ConnectionError("DevTools connection closed")
+        self._next_id += 1
+        message_id = self._next_id
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout or settings.SELENIUM_SCRIPT_TIMEOUT)
+        except websockets.ConnectionClosed as e:
+            raise ConnectionError(f"DevTools connection closed: {e}") from e
+        finally:
+            self._pending.pop(message_id, None)
+
+    def set_event_handler(self, session_id, handler):
+        """Registers handler(method, params) for the events of a target session (None removes it)."""
+        if handler is None:
+            self._handlers.pop(session_id, None)
+        else:
+            self._handlers[session_id] = handler
+
+    async def _read_loop(self):
+        try:
+            async for raw_message in self._ws:
+                message = json.loads(raw_message)
+                if 'id' in message:
+                    future = self._pending.get(message['id'])
+                    if future is None or future.done():
+                        continue # Caller already timed out
+                    if 'error' in message:
+                        future.set_exception(WebDriverException(message['error'].get('message', 'DevTools command failed')))
+                    else:
+                        future.set_result(message.get('result', {}))
+                else:
+                    handler = self._handlers.get(message.get('sessionId'))
+                    if handler is not None:
+                        handler(message.get('method'), message.get('params', {}))
+        except websockets.ConnectionClosed:
+            pass # Browser gone; fail whatever is still waiting
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("DevTools connection closed"))
+            # Every tab went down with the browser; wake up any waiting for a page load
+            for handler in list(self._handlers.values()):
+                handler('Inspector.targetCrashed', {})
+
+    async def close(self):
+        await self._ws.close()
+        await self._reader
+
+
+class AsyncTab:
+    """
+    One page target of an AsyncChromeBrowser, attached through a flattened
+    DevTools session on the shared connection. Console entries (filtered to
+    BROWSER_LOG_LEVEL, same shape as get_log) and load events are collected as
+    they arrive, the way CdpConsoleCapture does for Selenium sessions.
+    """
+
+    # Event that ends page loading for each SELENIUM_PAGE_LOAD_STRATEGY
+    LOAD_EVENTS = {'normal': 'Page.loadEventFired', 'eager': 'Page.domContentEventFired',
+                   'none': 'Page.domContentEventFired'}
+
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.pages_crawled = 0
+        self.crashed = False
+        self._entries = []
+        self._loaded = asyncio.Event()
+        self._load_event = self.LOAD_EVENTS.get(settings.SELENIUM_PAGE_LOAD_STRATEGY, 'Page.loadEventFired')
+        self._min_rank = BROWSER_LOG_LEVEL_RANKS.get(settings.BROWSER_LOG_LEVEL.upper(), 0)
+        connection.set_event_handler(session_id, self._on_event)
+
+    @classmethod
+    async def open(cls, connection):
+        """Creates a new blank tab and subscribes to the events the crawl needs."""
+        target = await connection.send('Target.createTarget', {'url': 'about:blank'})
+        attached = await connection.send('Target.attachToTarget', {'targetId': target['targetId'], 'flatten': True})
+        tab = cls(connection, target['targetId'], attached['sessionId'])
+        for method in ('Page.enable', 'Runtime.enable', 'Log.enable'):
+            await tab.send(method)
+        patterns = get_blocked_url_patterns()
+        if patterns:
+            await tab.send('Network.enable')
+            await tab.send('Network.setBlockedURLs', {'urls': list(patterns)})
+        return tab
+
+    async def send(self, method, params=None, timeout=None):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    def _on_event(self, method, params):
+        if method == self._load_event:
+            self._loaded.set()
+        elif method == 'Inspector.targetCrashed':
+            self.crashed = True
+            self._loaded.set() # Don't wait for a load event that will never come
+        else:
+            entry = CdpConsoleCapture.to_log_entry(method, params)
+            if entry and BROWSER_LOG_LEVEL_RANKS.get(entry['level'], 0) >= self._min_rank:
+                self._entries.append(entry)
+
+    async def evaluate(self, script):
+        """Runs a WebDriver-style script (one with a return statement) in the page and returns its value."""
+        response = await self.send('Runtime.evaluate', {'expression': f"(function () {{ {script} }})()",
+                                                        'returnByValue': True})
+        if 'exceptionDetails' in response:
+            raise WebDriverException(f"javascript error: {response['exceptionDetails'].get('text')}")
+        return response.get('result', {}).get('value')
+
+    async def _wait_for_page_settle(self):
+        """The asyncio counterpart of wait_for_page_settle; returns the entries captured so far."""
+        start = time.monotonic()
+        deadline = start + settings.PAGE_SETTLE_MAX_WAIT
+        quiet_period = settings.PAGE_SETTLE_QUIET_MS / 1000.0
+        last_activity = start
+        last_resource_count = None
+        last_entry_count = len(self._entries)
+        ready_states = get_page_ready_states()
+
+        while True:
+            ready_state, resource_count = await self.evaluate(PAGE_ACTIVITY_SCRIPT)
+            now = time.monotonic()
+            if len(self._entries) != last_entry_count or ready_state not in ready_states \
+                    or resource_count != last_resource_count:
+                last_activity = now
+            last_entry_count = len(self._entries)
+            last_resource_count = resource_count
+
+            if now - last_activity >= quiet_period or now >= deadline:
+                break
+            await asyncio.sleep(settings.PAGE_SETTLE_POLL_INTERVAL)
+        return list(self._entries)
+
+    async def crawl(self, url, message_filter, on_navigated=None):
+        """
+        Loads a single URL in this tab and captures its console logs. Returns the
+        same result dictionary as crawl_single_url (on_navigated works the same too).
+        """
+        result = new_crawl_result(url)
+        try:
+            self._entries = [] # Drop late entries from the previous page
+            self._loaded.clear()
+            # Page.navigate only answers once the server starts responding, so it shares the page load timeout
+            deadline = time.monotonic() + settings.SELENIUM_PAGE_LOAD_TIMEOUT
+            try:
+                navigation = await self.send('Page.navigate', {'url': url}, timeout=settings.SELENIUM_PAGE_LOAD_TIMEOUT)
+                if navigation.get('errorText'):
+                    raise WebDriverException(f"unknown error: {navigation['errorText']}")
+                await asyncio.wait_for(self._loaded.wait(), max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                await self.send('Page.stopLoading')
+                raise TimeoutException()
+            if self.crashed:
+                raise WebDriverException("tab crashed")
+            if on_navigated is not None:
+                on_navigated()
+
+            if settings.PAGE_SETTLE_STRATEGY == 'settle':
+                logs = await self._wait_for_page_settle()
+            else:
+                if settings.CRAWL_DELAY > 0:
+                    await asyncio.sleep(settings.CRAWL_DELAY)
+                logs = list(self._entries)
+            if get_blocked_url_patterns():
+                result['transferred_bytes'] = int(await self.evaluate(PAGE_TRANSFER_SIZE_SCRIPT) or 0)
+            if settings.HOST_ADAPTIVE_RATE:
+                result['http_status'], result['ttfb_ms'] = parse_navigation_timing(
+                    await self.evaluate(PAGE_NAVIGATION_TIMING_SCRIPT))
+
+            add_log_entries(result, logs, message_filter)
+
+        except TimeoutException:
+            logging.error(f"Timeout loading page {url} after {settings.SELENIUM_PAGE_LOAD_TIMEOUT} seconds.")
+            result['status'] = 'timeout'
+        except WebDriverException as e:
+            logging.error(f"DevTools error navigating to or processing {url}: {e.msg}")
+            result.update(status='webdriver_error', error_type=type(e).__name__, error_message=e.msg,
+                          session_lost=self.crashed or is_dead_session_error(e))
+        except Exception as e:
+            session_lost = self.crashed or is_dead_session_error(e)
+            logging.error(f"Unexpected error processing {url}: {e}", exc_info=not session_lost)
+            result.update(status='error', error_type=type(e).__name__, error_message=str(e), session_lost=session_lost)
+
+        self.pages_crawled += 1
+        return result
+
+    async def close(self):
+        """Closes the tab; errors (e.g. the browser is already gone) are ignored."""
+        self.connection.set_event_handler(self.session_id, None)
+        try:
+            await self.connection.send('Target.closeTarget', {'targetId': self.target_id})
+        except Exception as e:
+            logging.debug(f"Could not close tab {self.target_id}: {e}")
+
+
+class AsyncChromeBrowser:
+    """
+    Headless Chrome started directly (no chromedriver, no WebDriver HTTP calls)
+    and driven over a single DevTools websocket from an asyncio event loop.
+    Uses the same command-line switches as build_chrome_options(). attach()
+    drives the tabs of a Chrome started elsewhere instead.
+    """
+
+    def __init__(self, process, user_data_dir, connection):
+        self.process = process
+        self.user_data_dir = user_data_dir
+        self.connection = connection
+
+    @classmethod
+    async def launch(cls):
+        user_data_dir = tempfile.mkdtemp(prefix='sitemap-crawler-chrome-')
+        # ChromeDriver accepts switches without the leading dashes (e.g. user-agent=...); Chrome itself does not
+        switches = [arg if arg.startswith('--') else f"--{arg}" for arg in build_chrome_options().arguments]
+        command = [find_chrome_binary(), '--remote-debugging-port=0', f"--user-data-dir={user_data_dir}",
+                   '--no-first-run', '--no-default-browser-check', *switches, 'about:blank']
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        try:
+            # Chrome writes its DevTools port and browser target path here once it is listening
+            port_file = os.path.join(user_data_dir, 'DevToolsActivePort')
+            deadline = time.monotonic() + CHROME_STARTUP_TIMEOUT
+            lines = []
+            while len(lines) < 2:
+                if process.poll() is not None:
+                    raise WebDriverException(f"Chrome exited during startup (exit code {process.returncode}).")
+                if time.monotonic() > deadline:
+                    raise WebDriverException(f"Chrome did not open its DevTools port within {CHROME_STARTUP_TIMEOUT}s.")
+                await asyncio.sleep(0.1)
+                try:
+                    with open(port_file, 'r', encoding='utf-8') as f:
+                        lines = f.read().split()
+                except OSError:
+                    pass
+            connection = await AsyncCdpConnection.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}")
+        except BaseException:
+            process.kill()
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+            raise
+        return cls(process, user_data_dir, connection)
+
+    @classmethod
+    async def attach(cls, debugger_address):
+        """
+        Connects to a Chrome that is already running (e.g. started by ChromeDriver)
+        at debugger_address ('host:port'), without taking ownership of it.
+        """
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(None, lambda: requests.get(
+            f"http://{debugger_address}/json/version", timeout=settings.REQUESTS_TIMEOUT).json())
+        connection = await AsyncCdpConnection.connect(version['webSocketDebuggerUrl'])
+        return cls(None, None, connection)
+
+    async def new_tab(self):
+        return await AsyncTab.open(self.connection)
+
+    async def close(self):
+        """Closes Chrome and removes its temporary profile (only disconnects from an attached Chrome)."""
+        if self.process is None:
+            await self.connection.close()
+            return
+        try:
+            await self.connection.send('Browser.close')
+        except Exception:
+            pass # Already gone
+        await self.connection.close()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class RelaunchingChromeBrowser:
+    """
+    An AsyncChromeBrowser for the 'cdp_async' engine that is relaunched when it
+    dies, with the same interface. If Chrome dies, the DevTools connection drops
+    and every tab reports its page as session lost; the next new_tab() then
+    launches a new Chrome, once for all tab workers, so their crash retries run
+    in it. If that launch fails, the error is raised to every later caller.
+    """
+
+    def __init__(self):
+        self.browser = None
+        self._launch_error = None
+        self._lock = None
+
+    async def launch(self):
+        self.browser = await AsyncChromeBrowser.launch()
+
+    async def new_tab(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Only the first tab to notice a lost browser relaunches it; the others wait and reuse the new one
+        async with self._lock:
+            if self._launch_error is not None:
+                raise self._launch_error
+            if self.browser.connection.closed:
+                logging.warning("Chrome's DevTools connection was lost; relaunching Chrome...")
+                await self.browser.close()
+                self.browser = None
+                try:
+                    await self.launch()
+                except Exception as e:
+                    self._launch_error = e
+                    raise
+        return await self.browser.new_tab()
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+
+
+async def _crawl_tab_politely(tab, url, message_filter, executor):
+    """The asyncio counterpart of crawl_politely for AsyncTab.crawl; waits for host slots in executor."""
+    scheduler = get_host_scheduler()
+    loop = asyncio.get_running_loop()
+    for attempt in range(settings.HOST_THROTTLE_RETRIES + 1):
+        slot = _HostSlot(scheduler, await loop.run_in_executor(executor, scheduler.acquire, url))
+        try:
+            result = await tab.crawl(url, message_filter, slot.release)
+        finally:
+            slot.release()
+        scheduler.record(slot.host, result)
+        if result.get('http_status') not in HOST_THROTTLE_STATUSES or attempt == settings.HOST_THROTTLE_RETRIES:
+            return result
+        logging.warning(f"{url} answered HTTP {result['http_status']}; retrying after backing off.")
+
+
+async def _async_tab_worker(worker_name, browser, url_queue, executor, message_filter, handle_result, progress):
+    """
+    Asyncio counterpart of _crawl_worker: crawls URLs from the shared queue in its
+    own tab until it receives None, passing each result to handle_result (progress
+    formats the URL counter). A crashed tab is replaced and the URL retried
+    (CRASH_RETRY_ATTEMPTS); browser is expected to replace a dead Chrome in
+    new_tab() (see RelaunchingChromeBrowser, SessionTabBrowser). If no new tab
+    can be opened, the URL is recorded as a 'webdriver_error' and the worker
+    stops. Tabs are also replaced every SESSION_RECYCLE_PAGES pages.
+    Returns the number of URLs crawled.
+    """
+    loop = asyncio.get_running_loop()
+    tab = None
+    crawled = 0
+    try:
+        tab = await browser.new_tab()
+        while True:
+            # Blocks (in the executor, not the event loop) while discovery is still producing URLs
+            item = await loop.run_in_executor(executor, url_queue.get)
+            if item is None:
+                break
+            i, url = item
+            logging.info(f"[{worker_name}] Crawling URL {progress(i)}: {url}")
+
+            attempt = 1
+            result = await _crawl_tab_politely(tab, url, message_filter, executor)
+            while result['session_lost']:
+                await tab.close()
+                tab = None
+                try:
+                    tab = await browser.new_tab()
+                except Exception as e:
+                    # No browser left to retry in: record the page instead of dropping it, then stop
+                    result.update(status='webdriver_error', error_type=type(e).__name__, error_message=str(e))
+                    handle_result(result)
+                    crawled += 1
+                    raise
+                if attempt > settings.CRASH_RETRY_ATTEMPTS:
+                    logging.error(f"[{worker_name}] Giving up on {url} after {attempt} attempt(s); the tab crashed each time.")
+                    break
+                attempt += 1
+                logging.warning(f"[{worker_name}] Retrying {url} in a new tab (attempt {attempt}).")
+                result = await _crawl_tab_politely(tab, url, message_filter, executor)
+                result['attempts'] = attempt
+
+            # Blocks the loop only while the result writer's queue is full (backpressure)
+            handle_result(result)
+            crawled += 1
+
+            if settings.SESSION_RECYCLE_PAGES and tab.pages_crawled >= settings.SESSION_RECYCLE_PAGES:
+                logging.info(f"[{worker_name}] Recycling tab after {tab.pages_crawled} page(s).")
+                await tab.close()
+                tab = None
+                tab = await browser.new_tab()
+
+    except Exception as e:
+        logging.error(f"[{worker_name}] Worker stopped after {crawled} URL(s): {e}", exc_info=True)
+    finally:
+        if tab is not None:
+            await tab.close()
+        logging.info(f"[{worker_name}] Finished, crawled {crawled} URL(s).")
+    return crawled
+
+
+async def _crawl_async(urls_to_crawl, tab_count, message_filter, aggregator):
+    """
+    Crawls the URLs with tab_count tabs of one Chrome instance, all driven from
+    a single event loop. URLs come from a feeder thread, as in _run_thread_pool.
+    """
+    url_queue = queue.Queue()
+    feeder = threading.Thread(target=_feed_url_queues, name='URLFeeder',
+                              args=(urls_to_crawl, [url_queue], tab_count, aggregator), daemon=True)
+    feeder.start()
+
+    executor = ThreadPoolExecutor(max_workers=tab_count, thread_name_prefix='URLQueue')
+    browser = None
+    try:
+        logging.info("Launching Chrome for the asyncio DevTools engine...")
+        browser = RelaunchingChromeBrowser()
+        await browser.launch()
+        await asyncio.gather(*(
+            _async_tab_worker(f"Tab-{n}", browser, url_queue, executor, message_filter,
+                              aggregator.handle, aggregator.progress)
+            for n in range(1, tab_count + 1)
+        ))
+    finally:
+        if browser is not None:
+            await browser.close()
+        executor.shutdown(wait=False)
+    feeder.join()
+
+
+def crawl_and_log_errors(urls_to_crawl, crawl_state=None, checkpoint=None):
+    """
+    Crawls each URL using a pool of Selenium sessions (BROWSER_POOL_SIZE in settings.py),
+    captures console errors based on settings.py, and saves them to the RESULT_STORE
+    (and/or individual files). Sessions run in threads or in separate processes depending on CRAWL_EXECUTION_MODE.
+    With CRAWL_ENGINE 'cdp_async', tabs of a single Chrome driven over DevTools
+    from an asyncio event loop are used instead (ASYNC_CONCURRENT_TABS).
+
+    urls_to_crawl may be a list or a lazy iterable such as iter_page_urls(); crawling
+    starts as soon as the first URL is available. Successfully crawled URLs are
+    recorded in crawl_state (a CrawlState) and every written result is journaled
+    in checkpoint (a CrawlCheckpoint), if given. Returns the number of URLs
+    received, or None if the crawl could not be set up.
+    """
+    # Sized collections can be checked up front; generators are only known to be empty at the end
+    if hasattr(urls_to_crawl, '__len__') and not urls_to_crawl:
+        logging.info("No URLs found to crawl.")
+        return 0
+
+    engine = str(settings.CRAWL_ENGINE).lower()
+    if engine not in ('selenium', 'cdp_async'):
+        logging.warning(f"Unknown CRAWL_ENGINE '{settings.CRAWL_ENGINE}', using 'selenium'.")
+        engine = 'selenium'
+
+    try:
+        if engine == 'cdp_async':
+            if websockets is None:
+                logging.error("CRAWL_ENGINE 'cdp_async' requires the websockets package (pip install websockets).")
+                return None
+            service_path = None # Chrome is started directly, without ChromeDriver
+        else:
+            if settings.TABS_PER_BROWSER > 1 and websockets is None:
+                logging.error("TABS_PER_BROWSER > 1 requires the websockets package (pip install websockets).")
+                return None
+            logging.info(f"Setting up Selenium WebDriver based on settings.py...")
+            logging.info("Installing/Verifying ChromeDriver...")
+            # Resolve the driver once; every worker shares the same service path
+            try:
+                service_path = resolve_chromedriver_path()
+            except Exception as driver_manager_err:
+                 logging.error(f"Failed to download/install ChromeDriver: {driver_manager_err}", exc_info=True)
+                 return None # Cannot proceed without driver
+
+        # Use output directory from settings
+        output_dir = settings.OUTPUT_DIRECTORY
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            logging.info(f"Saving error logs to directory: '{os.path.abspath(output_dir)}'")
+        except OSError as dir_err:
+            logging.error(f"Could not create output directory '{output_dir}': {dir_err}", exc_info=True)
+            return None # Cannot proceed without output directory
+
+        try:
+            result_store = open_result_store(output_dir)
+        except (OSError, sqlite3.Error) as store_err:
+            logging.error(f"Could not open the {settings.RESULT_STORE} result store: {store_err}", exc_info=True)
+            return None
+        error_index = None
+        if settings.ERROR_INDEX:
+            error_index = ErrorIndex(settings.ERROR_INDEX_FILE or os.path.join(output_dir, 'error_index.json'),
+                                     settings.ERROR_INDEX_MAX_URLS)
+        aggregator = ResultAggregator(output_dir, crawl_state=crawl_state, checkpoint=checkpoint,
+                                      result_store=result_store, error_index=error_index)
+
+        # Compile the message filters once for the whole run
+        message_filter = LogMessageFilter(settings.FILTER_LOG_MESSAGES)
+        suppression_rules = get_suppression_rules() # Reports invalid or expired rules up front
+        if suppression_rules:
+            logging.info(f"{len(suppression_rules)} suppression rule(s) active.")
+
+        pool_size = max(1, int(settings.ASYNC_CONCURRENT_TABS if engine == 'cdp_async' else settings.BROWSER_POOL_SIZE))
+        if hasattr(urls_to_crawl, '__len__'):
+            pool_size = min(pool_size, len(urls_to_crawl))
+        execution_mode = str(settings.CRAWL_EXECUTION_MODE).lower()
+        if engine == 'cdp_async':
+            logging.info(f"Starting crawl with {pool_size} concurrent tab(s) on the asyncio DevTools engine...")
+        else:
+            if settings.SESSION_RECYCLE_MAX_RSS_MB and psutil is None:
+                logging.warning("SESSION_RECYCLE_MAX_RSS_MB is set but psutil is not installed; memory-based session recycling is disabled.")
+            tabs = f" with {settings.TABS_PER_BROWSER} tabs each" if settings.TABS_PER_BROWSER > 1 else ""
+            logging.info(f"Starting crawl with {pool_size} browser session(s){tabs} in {execution_mode} mode...")
+
+        try:
+            if engine == 'cdp_async':
+                asyncio.run(_crawl_async(urls_to_crawl, pool_size, message_filter, aggregator))
+            elif execution_mode == 'process':
+                _run_process_pool(urls_to_crawl, pool_size, service_path, message_filter, aggregator)
+            else:
+                if execution_mode != 'thread':
+                    logging.warning(f"Unknown CRAWL_EXECUTION_MODE '{settings.CRAWL_EXECUTION_MODE}', using 'thread'.")
+                _run_thread_pool(urls_to_crawl, pool_size, service_path, message_filter, aggregator)
+        finally:
+            aggregator.close()
+
+        if not aggregator.total_urls:
+            logging.info("No URLs found to crawl.")
+        else:
+            aggregator.log_summary()
+            get_host_scheduler().log_summary()
+        return aggregator.total_urls
+
+    except Exception as e:
+        logging.error(f"Failed during WebDriver setup or main loop: {e}", exc_info=True)
+        return None
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Crawl the pages of a sitemap and log their browser console errors.")
+    arg_parser.add_argument('sitemap_url', nargs='?',
+                            help="URL of the sitemap to crawl. You are prompted for it if omitted.")
+    arg_parser.add_argument('--resume', action='store_true',
+                            help="Resume an interrupted crawl, skipping URLs already completed according to CHECKPOINT_FILE.")
+    arg_parser.add_argument('--export-logs', action='store_true',
+                            help="Write the per-URL text log files into OUTPUT_DIRECTORY from the RESULT_STORE of a previous crawl, then exit.")
+    args = arg_parser.parse_args()
+
+    if args.export_logs:
+        if settings.RESULT_STORE not in RESULT_STORES:
+            arg_parser.error(f"--export-logs needs RESULT_STORE set to one of: {', '.join(RESULT_STORES)}")
+        store_path = get_result_store_path(settings.OUTPUT_DIRECTORY)
+        if not os.path.isfile(store_path):
+            arg_parser.error(f"No {settings.RESULT_STORE} result store found at '{store_path}'; run a crawl first.")
+        try:
+            exported = export_log_files(settings.OUTPUT_DIRECTORY)
+        except (OSError, ValueError, KeyError, sqlite3.DatabaseError) as e:
+            logging.error(f"Could not read the result store '{store_path}': {e}")
+            raise SystemExit(1)
+        logging.info(f"Exported {exported} result(s) to '{os.path.abspath(settings.OUTPUT_DIRECTORY)}'.")
+        raise SystemExit(0)
+
+    start_sitemap_url = args.sitemap_url
+    if not start_sitemap_url and args.resume:
+        # Resume the sitemap recorded in the checkpoint
+        start_sitemap_url = CrawlCheckpoint.read_sitemap_url(settings.CHECKPOINT_FILE)
+    if not start_sitemap_url:
+        # Get sitemap URL from user input
+        start_sitemap_url = input("Enter the URL of the WordPress sitemap (e.g., https://example.com/sitemap.xml): ")
+    start_sitemap_url = start_sitemap_url.strip()
+
+    # Basic validation of the input URL format
+    if not start_sitemap_url:
+        print("Error: Sitemap URL cannot be empty.")
+    elif not (start_sitemap_url.startswith('http://') or start_sitemap_url.startswith('https://')):
+        print("Error: Invalid URL format. Please include http:// or https://")
+    else:
+        # Start the process
+        logging.info(f"Starting sitemap processing for: {start_sitemap_url}")
+
+        # Crawl state records when each URL was last crawled (used by incremental mode)
+        crawl_state = CrawlState.load(settings.CRAWL_STATE_FILE) if settings.CRAWL_STATE_FILE else None
+        checkpoint = CrawlCheckpoint(settings.CHECKPOINT_FILE, start_sitemap_url, resume=args.resume)
+
+        try:
+            # 1. Discover page URLs lazily (skipping unchanged ones in incremental mode)
+            urls_to_crawl = select_urls_to_crawl(iter_sitemap_entries(start_sitemap_url), crawl_state)
+            if args.resume:
+                urls_to_crawl = skip_completed_urls(urls_to_crawl, checkpoint)
+            # 2. Crawl each one as soon as it is found
+            total_found = crawl_and_log_errors(urls_to_crawl, crawl_state, checkpoint)
+        finally:
+            # Persist progress even if the crawl is interrupted (e.g., Ctrl+C)
+            checkpoint.close()
+            if crawl_state is not None:
+                crawl_state.save()
+
+        if total_found:
+            logging.info(f"Crawled {total_found} page URLs from the sitemap(s).")
+            logging.info("Crawling process finished.")
+        elif total_found == 0 and (settings.INCREMENTAL_CRAWL or args.resume):
+            logging.info("No new, changed or unfinished page URLs to crawl.")
+        elif total_found == 0:
             logging.warning("No page URLs were extracted from the provided sitemap. Check URL and sitemap format, or previous log messages.")
 
     logging.info("Script finished.")
\ No newline at end of file
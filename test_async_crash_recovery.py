@@ -0,0 +1,111 @@
+# test_async_crash_recovery.py
+"""
+Tests for the 'cdp_async' engine's recovery when Chrome's DevTools connection
+closes mid-crawl, using stand-ins for Chrome and its tabs.
+
+Usage: python -m pytest test_async_crash_recovery.py
+"""
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import sitemap_crawler
+from sitemap_crawler import AsyncChromeBrowser, LogMessageFilter, RelaunchingChromeBrowser, _async_tab_worker, new_crawl_result
+
+
+class FakeConnection:
+    closed = False
+
+
+class FakeTab:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_crawled = 0
+
+    async def crawl(self, url, message_filter, on_navigated=None):
+        result = new_crawl_result(url)
+        if self.browser.connection.closed or url in self.browser.crash_on:
+            # Chrome dies while loading the page: the connection drops under every tab
+            self.browser.connection.closed = True
+            result.update(status='error', error_type='ConnectionError',
+                          error_message="DevTools connection closed", session_lost=True)
+        self.pages_crawled += 1
+        return result
+
+    async def close(self):
+        pass
+
+
+class FakeChrome:
+    def __init__(self, crash_on):
+        self.connection = FakeConnection()
+        self.crash_on = crash_on
+
+    async def new_tab(self):
+        if self.connection.closed:
+            raise ConnectionError("DevTools connection closed")
+        return FakeTab(self)
+
+    async def close(self):
+        pass
+
+
+def crawl(monkeypatch, urls, launches):
+    """Crawls urls in two tab workers; launches yields what each AsyncChromeBrowser.launch() returns or raises."""
+    monkeypatch.setattr(settings, 'HOST_THROTTLE_RETRIES', 0)
+    launch_count = []
+
+    async def launch():
+        launch_count.append(1)
+        outcome = next(launches)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(AsyncChromeBrowser, 'launch', staticmethod(launch))
+    sitemap_crawler.get_host_scheduler.cache_clear()
+
+    url_queue = queue.Queue()
+    for i, url in enumerate(urls, 1):
+        url_queue.put((i, url))
+    for _ in range(2):
+        url_queue.put(None)
+
+    results = []
+
+    async def run():
+        browser = RelaunchingChromeBrowser()
+        await browser.launch()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            await asyncio.gather(*(
+                _async_tab_worker(f"Tab-{n}", browser, url_queue, executor, LogMessageFilter([]), results.append, str)
+                for n in (1, 2)
+            ))
+    asyncio.run(run())
+    return {result['url']: result for result in results}, len(launch_count)
+
+
+def test_lost_connection_relaunches_chrome_and_retries_the_page(monkeypatch):
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    crash_on = {"https://example.com/4"}
+    launches = iter([FakeChrome(crash_on), FakeChrome(set())])
+
+    results, launch_count = crawl(monkeypatch, urls, launches)
+
+    assert launch_count == 2
+    assert set(results) == set(urls)
+    assert all(result['status'] == 'ok' for result in results.values())
+    assert results["https://example.com/4"]['attempts'] == 2
+
+
+def test_failed_relaunch_records_the_page_being_crawled(monkeypatch):
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    crash_on = {"https://example.com/4"}
+    launches = iter([FakeChrome(crash_on), OSError("Chrome failed to start")])
+
+    results, launch_count = crawl(monkeypatch, urls, launches)
+
+    assert launch_count == 2
+    failed = results["https://example.com/4"]
+    assert failed['status'] == 'webdriver_error'
+    assert failed['error_type'] == 'OSError'
@@ -0,0 +1,34 @@
+# test_log_message_filter.py
+"""
+Tests for LogMessageFilter rules that can't simply be joined into one regex.
+
+Usage: python -m pytest test_log_message_filter.py
+"""
+from sitemap_crawler import LogMessageFilter
+
+
+def test_regex_with_inline_flags():
+    message_filter = LogMessageFilter(['re:(?s)foo.*bar', 're:plain'])
+    assert message_filter.matches("foo\nbar")
+    assert message_filter.matches("a plain message")
+    assert not message_filter.matches("foo only")
+
+
+def test_regexes_with_the_same_group_name():
+    message_filter = LogMessageFilter(['re:(?P<id>a+)x', 're:(?P<id>b+)y'])
+    assert message_filter.matches("aax")
+    assert message_filter.matches("by")
+    assert not message_filter.matches("ay")
+
+
+def test_numbered_backreferences_keep_their_meaning():
+    message_filter = LogMessageFilter(['re:(a)\\1', 're:(b)\\1'])
+    assert message_filter.matches("aa")
+    assert message_filter.matches("bb")
+    assert not message_filter.matches("ab")
+
+
+def test_invalid_regex_is_ignored():
+    message_filter = LogMessageFilter(['re:(unclosed', 'known noise'])
+    assert message_filter.rule_count == 1
+    assert message_filter.matches("Some KNOWN NOISE here")